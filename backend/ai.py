@@ -2,12 +2,18 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import openai
 import os
 from dotenv import load_dotenv
 import json
 from datetime import datetime
 import logging
+from services.cache import (
+    ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION, analysis_cache_config, create_analysis_cache, content_key
+)
+from services.llm_gateway import get_gateway
+from services import metrics
+from services.singleflight import SingleFlight
+from services.context_window import build_context
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +24,7 @@ load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
 
 # Configure rate limiter
 limiter = Limiter(
@@ -25,17 +32,25 @@ limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"]
 )
+# Metrics scrapes should not use up the default limits
+limiter.exempt(app.view_functions['metrics'])
+
+# Approximate tokens of page text sent alongside a highlight
+ANALYSIS_CONTEXT_TOKENS = int(os.getenv('ANALYSIS_CONTEXT_TOKENS', 1500))
 
-# Configure OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Content-addressed disk cache of analyses, bounded in size
+instance_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+os.makedirs(instance_path, exist_ok=True)
+analysis_cache = create_analysis_cache(analysis_cache_config(instance_path))
+analysis_flights = SingleFlight()
 
-def validate_text(text):
+def validate_text(text, max_length=2000):
     """Validate the input text."""
     if not text or not isinstance(text, str):
         return False, "Invalid text input"
     if len(text.strip()) < 10:
         return False, "Text is too short for meaningful analysis"
-    if len(text.strip()) > 2000:
+    if max_length is not None and len(text.strip()) > max_length:
         return False, "Text is too long for analysis"
     return True, text.strip()
 
@@ -95,11 +110,58 @@ Guidelines for the entire response:
 6. Ensure the restatement stands alone as a clear explanation
 """
 
+def request_analysis(cache_key, full_text, highlighted_text):
+    """Call OpenAI for an analysis of validated texts and cache the parsed answer."""
+    # A request that just missed the previous flight finds its answer here
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Create the prompt
+    prompt = create_analysis_prompt(full_text, highlighted_text)
+
+    # Transient API errors are retried with backoff by the gateway; here we
+    # only ask again when the model's answer is not valid JSON
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            response = get_gateway().chat_completion(
+                model=ANALYSIS_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a financial education expert specializing in student financial literacy. Provide clear, educational analysis focused on learning outcomes."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000
+            )
+
+            # Extract and parse the response
+            ai_response = response.choices[0].message.content
+            analysis = json.loads(ai_response)
+            
+            # Add metadata
+            analysis["metadata"] = {
+                "timestamp": datetime.now().isoformat(),
+                "model": ANALYSIS_MODEL,
+                "full_text_length": len(full_text),
+                "highlighted_text_length": len(highlighted_text)
+            }
+            
+            analysis_cache.set(cache_key, analysis)
+            return analysis
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parsing error on attempt {attempt + 1}: {str(e)}")
+            if attempt == max_retries - 1:
+                raise
+            continue
+
 def analyze_text_with_ai(full_text, highlighted_text):
     """Analyze text using OpenAI's API with error handling and retries."""
     try:
         # Validate both texts
-        is_valid_full, result_full = validate_text(full_text)
+        # Long pages are trimmed to a token budget below instead of being rejected
+        is_valid_full, result_full = validate_text(full_text, max_length=None)
         is_valid_highlighted, result_highlighted = validate_text(highlighted_text)
         
         if not is_valid_full:
@@ -107,47 +169,19 @@ def analyze_text_with_ai(full_text, highlighted_text):
         if not is_valid_highlighted:
             return {"error": f"Invalid highlighted text: {result_highlighted}"}
 
-        # Create the prompt
-        prompt = create_analysis_prompt(result_full, result_highlighted)
-
-        # Call OpenAI API with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a financial education expert specializing in student financial literacy. Provide clear, educational analysis focused on learning outcomes."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
-
-                # Extract and parse the response
-                ai_response = response.choices[0].message.content
-                analysis = json.loads(ai_response)
-                
-                # Add metadata
-                analysis["metadata"] = {
-                    "timestamp": datetime.now().isoformat(),
-                    "model": "gpt-3.5-turbo",
-                    "full_text_length": len(result_full),
-                    "highlighted_text_length": len(result_highlighted)
-                }
-                
-                return analysis
-
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing error on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-                continue
-            except Exception as e:
-                logger.error(f"Error on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-                continue
+        context = build_context(result_full, result_highlighted, ANALYSIS_CONTEXT_TOKENS)
+
+        cache_key = content_key(
+            'ai-analyze', ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION, context, result_highlighted
+        )
+        cached = analysis_cache.get(cache_key)
+        metrics.record_cache('analysis', cached is not None)
+        if cached is not None:
+            logger.info("Returning cached analysis")
+            return cached
+
+        # Concurrent requests for the same highlight wait on one OpenAI call
+        return analysis_flights.do(cache_key, request_analysis, cache_key, context, result_highlighted)
 
     except Exception as e:
         logger.error(f"Error in AI analysis: {str(e)}")
@@ -6,7 +6,15 @@ from extensions import db, migrate
 from models import User, Goal, Debt, Transaction, Budget
 from routes import *
 from routes.ai import ai_bp
-from openai import OpenAI
+from services.cache import (
+    ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION, analysis_cache_config, create_analysis_cache, content_key
+)
+from services.llm_gateway import get_gateway, GatewayBusy, GatewayTimeout
+from services.singleflight import SingleFlight
+from services.context_window import build_context
+from services.wiki_index import load_index, write_index, page_spans, empty_index
+from services import metrics
+from services.insights import run_scheduler, refresh_insights
 
 # Load environment variables
 load_dotenv()
@@ -32,13 +40,35 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    # 'memory://' (per worker) or 'sqlite:///path' (shared by workers on a host)
+    app.config['INSIGHTS_CACHE_URL'] = os.getenv('INSIGHTS_CACHE_URL', 'memory://')
+    # Disk cache of /analyze answers, bounded in size
+    app.config.update(analysis_cache_config(instance_path))
+    # Approximate tokens of page text sent alongside a highlight
+    app.config['ANALYSIS_CONTEXT_TOKENS'] = int(os.getenv('ANALYSIS_CONTEXT_TOKENS', 1500))
+    # Built by `flask build-wiki-index`; rebuilt in memory at startup when missing
+    app.config['WIKI_INDEX_PATH'] = os.getenv('WIKI_INDEX_PATH', os.path.join(instance_path, 'wiki_index.json'))
+    # Processes the month-end insights job fans out to (`flask run-insights-scheduler`)
+    app.config['INSIGHTS_WORKERS'] = int(os.getenv('INSIGHTS_WORKERS', os.cpu_count() or 1))
+    # Wall time budget of one /api/goals/projection request; fewer paths are run past it
+    app.config['GOAL_SIMULATION_SECONDS'] = float(os.getenv('GOAL_SIMULATION_SECONDS', 2))
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    # LLM call metrics at GET /metrics plus a log line per request that used the LLM
+    metrics.init_app(app)
     
-    # Configure OpenAI
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    analysis_cache = create_analysis_cache(app.config)
+    analysis_flights = SingleFlight()
+    
+    # Section index of the static wiki pages, so highlights can be sent as offsets
+    try:
+        wiki_index = load_index(app.config['WIKI_INDEX_PATH'])
+    except OSError as e:
+        # No wiki pages on this host; /analyze/page then answers 404 for every page
+        app.logger.warning(f"Wiki index unavailable, serving no pages: {str(e)}")
+        wiki_index = empty_index()
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -47,6 +77,7 @@ def create_app():
     from routes.transactions import transactions_bp
     from routes.budget import budget_bp
     from routes.ai import ai_bp
+    from routes.whatif import whatif_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(goals_bp, url_prefix='/api/goals')
@@ -54,35 +85,60 @@ def create_app():
     app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
     app.register_blueprint(budget_bp, url_prefix='/api/budget')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(whatif_bp, url_prefix='/api/whatif')
+    
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute monthly_category_totals from the transactions table."""
+        from services.rollups import rebuild_monthly_totals
+        count = rebuild_monthly_totals()
+        print(f"Rebuilt {count} monthly category totals")
+    
+    @app.cli.command('detect-recurring')
+    def detect_recurring():
+        """Re-detect recurring transactions over every user's full history."""
+        from services.recurring import refresh_all_recurring
+        updated = refresh_all_recurring()
+        print(f"Updated {sum(updated.values())} transactions across {len(updated)} users")
+    
+    @app.cli.command('precompute-insights')
+    def precompute_insights_command():
+        """Precompute AI insights for every user for last month and this month."""
+        for year, month, count in refresh_insights(app):
+            print(f"Precomputed {count} insights for {year}-{month:02d}")
+    
+    @app.cli.command('run-insights-scheduler')
+    def run_insights_scheduler():
+        """Precompute insights after each month end; run in one dedicated process."""
+        print("Insights scheduler running; press Ctrl+C to stop")
+        try:
+            run_scheduler(app)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+    
+    @app.cli.command('build-wiki-index')
+    def build_wiki_index():
+        """Parse the financialLiteracyWiki pages into the section index."""
+        index = write_index(app.config['WIKI_INDEX_PATH'])
+        print(f"Indexed {len(index['pages'])} pages into {app.config['WIKI_INDEX_PATH']}")
     
     @app.route('/')
     def health_check():
         return {"status": "active", "models": ["User", "Goal", "Debt", "FinancialInfo", "Budget"]}
     
-    @app.route('/analyze', methods=['POST', 'OPTIONS'])
-    def analyze_text():
-        if request.method == 'OPTIONS':
-            # Handle preflight request
-            response = jsonify({'status': 'ok'})
-            response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-            response.headers.add('Access-Control-Allow-Methods', 'POST')
-            return response
-
-        try:
-            data = request.get_json()
-            full_text = data.get('full_text', '')
-            highlighted_text = data.get('highlighted_text', '')
-
-            if not highlighted_text:
-                return jsonify({'error': 'No text selected'}), 400
+    def generate_analysis(cache_key, context, highlighted_text):
+        """Ask OpenAI for an /analyze answer and cache it; None if it has no restatement."""
+        # A caller that just missed the previous flight finds its answer here
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-            # Prepare the prompt for OpenAI
-            prompt = f"""Please analyze the following highlighted text in the context of the full text. 
+        # Prepare the prompt for OpenAI
+        prompt = f"""Please analyze the following highlighted text in the context of the full text. 
             Provide a clear restatement and detailed analysis focusing on financial implications and recommendations.
 
-            Full Text:
-            {full_text}
+            Full Text (excerpts around the highlight):
+            {context}
 
             Highlighted Text:
             {highlighted_text}
@@ -104,66 +160,162 @@ def create_app():
             RELATED CONCEPTS:
             [List related financial concepts to consider]"""
 
-            # Call OpenAI API
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a financial analysis expert. Provide clear, concise, and actionable insights."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
-            except Exception as e:
-                print(f"OpenAI API error: {str(e)}")
-                return jsonify({'error': 'Failed to get analysis from OpenAI'}), 500
-
-            # Extract the analysis from the response
-            analysis = response.choices[0].message.content
-
-            # Parse the analysis into structured sections
-            sections = {}
-            current_section = None
-            current_text = []
-
-            for line in analysis.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if line.endswith(':'):
-                    if current_section and current_text:
-                        sections[current_section.lower()] = '\n'.join(current_text)
-                    current_section = line[:-1]
-                    current_text = []
-                elif current_section:
-                    current_text.append(line)
-
-            # Add the last section
-            if current_section and current_text:
-                sections[current_section.lower()] = '\n'.join(current_text)
-
-            # Create the result object with default empty strings
-            result = {
-                'restatement': sections.get('restatement', ''),
-                'implications': sections.get('implications', ''),
-                'risks': sections.get('risks', ''),
-                'recommendations': sections.get('recommendations', ''),
-                'related_concepts': sections.get('related concepts', '')
-            }
-
-            # Validate that we have at least a restatement
-            if not result['restatement']:
-                return jsonify({'error': 'Failed to generate analysis'}), 500
-
-            response = jsonify(result)
+        # Call OpenAI API through the shared gateway (bounded concurrency and timeouts)
+        response = get_gateway().chat_completion(
+            model=ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a financial analysis expert. Provide clear, concise, and actionable insights."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=1000
+        )
+
+        # Extract the analysis from the response
+        analysis = response.choices[0].message.content
+
+        # Parse the analysis into structured sections
+        sections = {}
+        current_section = None
+        current_text = []
+
+        for line in analysis.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            
+            if line.endswith(':'):
+                if current_section and current_text:
+                    sections[current_section.lower()] = '\n'.join(current_text)
+                current_section = line[:-1]
+                current_text = []
+            elif current_section:
+                current_text.append(line)
+
+        # Add the last section
+        if current_section and current_text:
+            sections[current_section.lower()] = '\n'.join(current_text)
+
+        # Create the result object with default empty strings
+        result = {
+            'restatement': sections.get('restatement', ''),
+            'implications': sections.get('implications', ''),
+            'risks': sections.get('risks', ''),
+            'recommendations': sections.get('recommendations', ''),
+            'related_concepts': sections.get('related concepts', '')
+        }
+
+        # Validate that we have at least a restatement
+        if not result['restatement']:
+            return None
+
+        analysis_cache.set(cache_key, result)
+        return result
+
+    def analysis_response(context, highlighted_text):
+        """Serve an /analyze answer from the cache or a (coalesced) OpenAI call."""
+        cache_key = content_key(
+            'analyze', ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION, context, highlighted_text
+        )
+        cached = analysis_cache.get(cache_key)
+        metrics.record_cache('analysis', cached is not None)
+        if cached is not None:
+            response = jsonify(cached)
             response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
             return response
 
+        # Identical highlights arriving together share one OpenAI call
+        try:
+            result = analysis_flights.do(cache_key, generate_analysis, cache_key, context, highlighted_text)
+        except GatewayBusy as e:
+            return jsonify({'error': str(e)}), 503
+        except GatewayTimeout as e:
+            print(f"OpenAI API timeout: {str(e)}")
+            return jsonify({'error': 'Timed out waiting for analysis from OpenAI'}), 504
+        except Exception as e:
+            print(f"OpenAI API error: {str(e)}")
+            return jsonify({'error': 'Failed to get analysis from OpenAI'}), 500
+
+        # Validate that we have at least a restatement
+        if result is None:
+            return jsonify({'error': 'Failed to generate analysis'}), 500
+
+        response = jsonify(result)
+        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
+        return response
+
+    @app.route('/analyze', methods=['POST', 'OPTIONS'])
+    def analyze_text():
+        if request.method == 'OPTIONS':
+            # Handle preflight request
+            response = jsonify({'status': 'ok'})
+            response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+            response.headers.add('Access-Control-Allow-Methods', 'POST')
+            return response
+
+        try:
+            data = request.get_json()
+            full_text = data.get('full_text', '')
+            highlighted_text = data.get('highlighted_text', '')
+
+            if not highlighted_text:
+                return jsonify({'error': 'No text selected'}), 400
+            
+            # Only the parts of the page near and about the highlight go in the prompt
+            context = build_context(full_text, highlighted_text, app.config['ANALYSIS_CONTEXT_TOKENS'])
+
+            return analysis_response(context, highlighted_text)
+
         except Exception as e:
             print(f"Error in analyze_text: {str(e)}")  # Add logging
             return jsonify({'error': str(e)}), 500
+
+    @app.route('/analyze/pages/<page_id>', methods=['GET'])
+    def get_wiki_page(page_id):
+        """Indexed sections of a wiki page, for mapping a selection to offsets."""
+        page = wiki_index['pages'].get(page_id)
+        if page is None:
+            return jsonify({'error': 'Unknown page'}), 404
+        return jsonify({'id': page_id, 'title': page['title'], 'sections': page['sections']})
+
+    @app.route('/analyze/page', methods=['POST', 'OPTIONS'])
+    def analyze_page():
+        """/analyze for a wiki page highlight sent as a page id plus offsets into its indexed text."""
+        if request.method == 'OPTIONS':
+            # Handle preflight request
+            response = jsonify({'status': 'ok'})
+            response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+            response.headers.add('Access-Control-Allow-Methods', 'POST')
+            return response
+
+        try:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({'error': 'Request body must be a JSON object'}), 400
+            page = wiki_index['pages'].get(data.get('page_id'))
+            if page is None:
+                return jsonify({'error': 'Unknown page'}), 404
+
+            try:
+                start = int(data.get('start'))
+                end = int(data.get('end'))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'start and end must be integers'}), 400
+            if not 0 <= start < end <= len(page['text']):
+                return jsonify({'error': 'Highlight is outside the page'}), 400
+
+            highlighted_text = page['text'][start:end]
+            context = build_context(
+                page['text'], highlighted_text, app.config['ANALYSIS_CONTEXT_TOKENS'],
+                highlight_start=start, spans=page_spans(page)
+            )
+            return analysis_response(context, highlighted_text)
+
+        except Exception as e:
+            print(f"Error in analyze_page: {str(e)}")
+            return jsonify({'error': str(e)}), 500
     
     return app
 
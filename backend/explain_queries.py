@@ -0,0 +1,135 @@
+"""Query planner audit for the transactions and rollup tables.
+
+Runs EXPLAIN QUERY PLAN over every transactions query the routes issue and
+fails if any of them falls back to a full scan of `transactions` or
+`monthly_category_totals`.
+
+    python explain_queries.py                 # schema built from the models
+    python explain_queries.py instance/app.db # an existing (migrated) database
+
+tests/test_query_plans.py runs the same audit under pytest.
+"""
+import re
+import sys
+from datetime import date
+from flask import Flask
+from extensions import db
+from models import Transaction
+from services.budget_engine import period_range, spent_query
+from services.queries import (
+    month_range, transactions_between, project, dated_page_query
+)
+from services.rollups import monthly_totals, monthly_spent_query, benchmark_ratios
+
+EMAIL = 'user@example.com'
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(transactions|monthly_category_totals)\b')
+
+# Queries that are expected to read the whole table. Each entry should name
+# the route it comes from so it can be dropped once that route is fixed.
+KNOWN_FULL_SCANS = {
+    # GET /api/transactions with no filters returns the whole history
+    'get_transactions: unfiltered',
+    # GET /api/transactions?category=... without an email has no usable prefix
+    'get_transactions: category',
+}
+
+
+def route_queries():
+    """(label, query) pairs mirroring the queries issued by the routes."""
+    start_date, end_date = month_range(2025, 3)
+    return [
+        ('get_transactions: unfiltered',
+         Transaction.query.order_by(Transaction.date.desc())),
+        ('get_transactions: category',
+         Transaction.query.filter_by(category='Food').order_by(Transaction.date.desc())),
+        ('get_transactions: user',
+         Transaction.query.filter_by(user_email=EMAIL).order_by(Transaction.date.desc())),
+        ('get_transactions: month',
+         transactions_between(start_date, end_date).order_by(Transaction.date.desc())),
+        ('get_transactions: user month',
+         transactions_between(start_date, end_date, EMAIL).order_by(Transaction.date.desc())),
+        ('get_transactions: user month category',
+         transactions_between(start_date, end_date, EMAIL)
+         .filter_by(category='Food').order_by(Transaction.date.desc())),
+        ('get_transactions: user page',
+         dated_page_query(project(Transaction.query.filter_by(user_email=EMAIL), ['name']),
+                          (date(2025, 3, 9), 42)).limit(101)),
+        ('get_transactions: user month page',
+         dated_page_query(project(transactions_between(start_date, end_date, EMAIL), ['name']),
+                          (date(2025, 3, 9), 42)).limit(101)),
+        ('export_transactions: user',
+         project(Transaction.query.filter_by(user_email=EMAIL), ['name', 'amount'])
+         .order_by(Transaction.date, Transaction.id)),
+        ('get_summary: month',
+         monthly_totals(2025, 3)),
+        ('get_summary: user month',
+         monthly_totals(2025, 3, EMAIL)),
+        ('budget_status: user month',
+         monthly_spent_query([EMAIL], *period_range('monthly'), ['Food', 'Housing'])),
+        ('budget_status: user week',
+         spent_query([EMAIL], *period_range('weekly'), ['Food', 'Housing'])),
+        ('budget_statuses: many users',
+         monthly_spent_query([EMAIL, 'other@example.com'], *period_range('yearly'), ['Food', 'Housing'])),
+        ('get_financial_summary: user month',
+         monthly_totals(2025, 3, EMAIL)),
+        ('get_financial_summary: user benchmark ratios',
+         benchmark_ratios(2025, 3, {'Food': 15, 'Other': 15}, 3000.0, EMAIL)),
+    ]
+
+
+def explain(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for an ORM query."""
+    compiled = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}
+    )
+    params = tuple(
+        value.isoformat() if isinstance(value, date) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def scans_full_table(plan):
+    return any(FULL_SCAN.match(detail) for detail in plan)
+
+
+def audit():
+    failures = []
+    for label, query in route_queries():
+        plan = explain(query)
+        full_scan = scans_full_table(plan)
+        if full_scan and label not in KNOWN_FULL_SCANS:
+            status = 'FAIL'
+            failures.append(label)
+        elif full_scan:
+            status = 'known'
+        else:
+            status = 'ok'
+        print(f'[{status:>5}] {label}')
+        for detail in plan:
+            print(f'          {detail}')
+    return failures
+
+
+def create_audit_app(db_path=None):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}' if db_path else 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else None
+    app = create_audit_app(db_path)
+    with app.app_context():
+        if db_path is None:
+            db.create_all()
+        failures = audit()
+    if failures:
+        print(f"\n{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} scan a whole table: {', '.join(failures)}")
+        sys.exit(1)
+    print('\nNo unexpected full scans.')
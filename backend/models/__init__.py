@@ -6,4 +6,7 @@ from .goal import Goal
 from .budget import Budget
 from .transaction import Transaction
 from .debt import Debt
-__all__ = ['db', 'User', 'Transaction', 'Goal', 'Debt', 'Budget']
\ No newline at end of file
+from .monthly_category_total import MonthlyCategoryTotal
+from .monthly_insight import MonthlyInsight
+from .month_version import MonthVersion
+__all__ = ['db', 'User', 'Transaction', 'Goal', 'Debt', 'Budget', 'MonthlyCategoryTotal', 'MonthlyInsight', 'MonthVersion']
\ No newline at end of file
@@ -0,0 +1,14 @@
+from extensions import db
+
+class MonthVersion(db.Model):
+    """Write counter per user and month of transactions.
+
+    Bumped alongside monthly_category_totals (by apply_monthly_deltas and
+    rebuild_monthly_totals), so services.rollups.month_version is a primary
+    key lookup instead of a pass over the month's rollup rows.
+    """
+    __tablename__ = 'month_versions'
+    user_email = db.Column(db.String(120), primary_key=True)  # '' counts writes by every user
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,126 @@
+from sqlalchemy import and_, event
+from sqlalchemy.orm.attributes import get_history
+from extensions import db
+from .transaction import Transaction
+from .month_version import MonthVersion
+
+class MonthlyCategoryTotal(db.Model):
+    """Running totals of transactions per user, month, category and direction.
+
+    Maintained incrementally by the Transaction mapper events below; bulk
+    writes that bypass the ORM must call apply_monthly_deltas themselves,
+    and services.rollups.rebuild_monthly_totals recomputes it from scratch.
+    """
+    __tablename__ = 'monthly_category_totals'
+    __table_args__ = (
+        # Month lookups that are not scoped to a user
+        db.Index('ix_monthly_category_totals_year_month', 'year', 'month'),
+    )
+    user_email = db.Column(db.String(120), primary_key=True)  # '' when the transaction has none
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)     # 'other' when the transaction has none
+    is_income = db.Column(db.Boolean, primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+def rollup_key(user_email, date, category, is_income):
+    """Rollup row a transaction with these values counts towards (None if undated)."""
+    if date is None:
+        return None
+    return (user_email or '', date.year, date.month, category or 'other', bool(is_income))
+
+
+def add_delta(deltas, key, amount, count):
+    if key is None:
+        return
+    total_delta, count_delta = deltas.get(key, (0.0, 0))
+    deltas[key] = (total_delta + float(amount or 0), count_delta + count)
+
+
+def apply_monthly_deltas(connection, deltas):
+    """Add {rollup_key: (total, count)} deltas to monthly_category_totals and bump their MonthVersions."""
+    table = MonthlyCategoryTotal.__table__
+    months = set()
+    for key, (total, count) in deltas.items():
+        if not total and not count:
+            continue
+        months.add(key[:3])
+        user_email, year, month, category, is_income = key
+        where = and_(
+            table.c.user_email == user_email,
+            table.c.year == year,
+            table.c.month == month,
+            table.c.category == category,
+            table.c.is_income == is_income
+        )
+        result = connection.execute(
+            table.update().where(where).values(
+                total=table.c.total + total,
+                count=table.c.count + count
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(
+                user_email=user_email, year=year, month=month,
+                category=category, is_income=is_income,
+                total=total, count=count
+            ))
+        elif count < 0:
+            connection.execute(table.delete().where(where, table.c.count <= 0))
+    bump_month_versions(connection, months)
+
+
+def bump_month_versions(connection, months):
+    """Add one to the MonthVersion of each (user_email, year, month), and of ('', year, month)."""
+    table = MonthVersion.__table__
+    keys = set(months) | {('', year, month) for _, year, month in months}
+    for user_email, year, month in keys:
+        where = and_(
+            table.c.user_email == user_email,
+            table.c.year == year,
+            table.c.month == month
+        )
+        result = connection.execute(table.update().where(where).values(version=table.c.version + 1))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(
+                user_email=user_email, year=year, month=month, version=1
+            ))
+
+
+def transaction_key(target):
+    return rollup_key(target.user_email, target.date, target.category, target.is_income)
+
+
+def previous_value(target, attr):
+    history = get_history(target, attr)
+    return history.deleted[0] if history.deleted else getattr(target, attr)
+
+
+@event.listens_for(Transaction, 'after_insert')
+def transaction_inserted(mapper, connection, target):
+    deltas = {}
+    add_delta(deltas, transaction_key(target), target.amount, 1)
+    apply_monthly_deltas(connection, deltas)
+
+
+@event.listens_for(Transaction, 'after_update')
+def transaction_updated(mapper, connection, target):
+    old_key = rollup_key(
+        previous_value(target, 'user_email'),
+        previous_value(target, 'date'),
+        previous_value(target, 'category'),
+        previous_value(target, 'is_income')
+    )
+    deltas = {}
+    add_delta(deltas, old_key, -float(previous_value(target, 'amount') or 0), -1)
+    add_delta(deltas, transaction_key(target), target.amount, 1)
+    apply_monthly_deltas(connection, deltas)
+
+
+@event.listens_for(Transaction, 'after_delete')
+def transaction_deleted(mapper, connection, target):
+    deltas = {}
+    add_delta(deltas, transaction_key(target), -float(target.amount or 0), -1)
+    apply_monthly_deltas(connection, deltas)
@@ -0,0 +1,18 @@
+from datetime import datetime
+from extensions import db
+
+class MonthlyInsight(db.Model):
+    """Precomputed /api/ai/api insights for one user and month.
+
+    Written by services.insights.precompute_insights (after month end, and
+    in the background once a row is stale). `version` is the services.rollups
+    month_version the insights were built from, so readers can tell when
+    later transaction writes have made a row stale.
+    """
+    __tablename__ = 'monthly_insights'
+    user_email = db.Column(db.String(120), primary_key=True)  # '' for all users combined
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(16), nullable=False)
+    insights = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,15 +1,28 @@
 from extensions import db
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Per-user month windows (get_transactions, get_summary, budget status)
+        db.Index('ix_transactions_user_email_date', 'user_email', 'date'),
+        # Per-user category drill-downs
+        db.Index('ix_transactions_user_email_category_date', 'user_email', 'category', 'date'),
+        # Month windows that are not scoped to a user
+        db.Index('ix_transactions_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  # e.g., "Amazon Purchase"
-    amount = db.Column(db.Float, nullable=False)
-    is_income = db.Column(db.Boolean, default=False)
-    category = db.Column(db.String(50))  # Consider ENUM type
-    date = db.Column(db.Date)            # Combined day/month/year
-    user_email = db.Column(db.String(120), db.ForeignKey('users.email'))
+    # active_history: the rollup listeners in monthly_category_total read the
+    # old values of these columns, even when set on an expired instance
+    amount = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
+    is_income = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
+    category = db.column_property(db.Column(db.String(50)), active_history=True)  # Consider ENUM type
+    auto_categorized = db.Column(db.Boolean, default=False)  # category filled in by services.categorizer
+    date = db.column_property(db.Column(db.Date), active_history=True)  # Combined day/month/year
+    user_email = db.column_property(db.Column(db.String(120), db.ForeignKey('users.email')), active_history=True)
     
     # New fields
     payment_method = db.Column(db.String(50))  # 'credit_card', 'bank_transfer'
     recurring = db.Column(db.Boolean, default=False)
-    plaid_transaction_id = db.Column(db.String(100))  # For Plaid syncs
\ No newline at end of file
+    recurrence = db.Column(db.String(10))       # 'weekly', 'biweekly', 'monthly' or 'yearly' when detected
+    next_expected_date = db.Column(db.Date)     # Predicted next occurrence of a recurring series
+    plaid_transaction_id = db.Column(db.String(100))  # For Plaid syncs
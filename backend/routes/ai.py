@@ -1,36 +1,58 @@
-from flask import request, jsonify, Blueprint
-from openai import OpenAI
+from flask import request, jsonify, Blueprint, current_app, Response, stream_with_context
 import os
 from dotenv import load_dotenv
 from models import Transaction, db
+from services.cache import create_cache
+from services.llm_gateway import get_gateway, GatewayBusy, GatewayTimeout
+from services.rollups import month_version
+from services.insights import compute_insights, schedule_insights_refresh, store_insights, stored_insights
+from services.queries import parse_bool
+from services import metrics
 from datetime import datetime
-import openai
 import json
-from functools import lru_cache
-import time
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
 
 # Create Flask Blueprint
 ai_bp = Blueprint('ai', __name__)
 
-# Initialize OpenAI client
-openai.api_key = os.getenv('OPENAI_API_KEY')
-
-# Cache for storing the last API call time and response
-last_api_call = {
-    'time': 0,
-    'response': None
-}
-
 # Cache duration in seconds (5 minutes)
 CACHE_DURATION = 5 * 60
 
+# Most insights responses kept before the least recently used are evicted
+CACHE_MAX_ENTRIES = 1024
+
+def insights_cache():
+    """The app's insights cache, built from INSIGHTS_CACHE_URL on first use."""
+    cache = current_app.extensions.get('insights_cache')
+    if cache is None:
+        cache = create_cache(
+            current_app.config.get('INSIGHTS_CACHE_URL', 'memory://'),
+            max_entries=CACHE_MAX_ENTRIES,
+            ttl=CACHE_DURATION
+        )
+        current_app.extensions['insights_cache'] = cache
+    return cache
+
+def sse_event(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat(chunks):
+    """Relay completion chunks as SSE `delta` events, then a final `done` event with usage."""
+    usage = None
+    try:
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield sse_event('delta', {"content": chunk.choices[0].delta.content})
+            if chunk.usage:
+                usage = chunk.usage.model_dump()
+        yield sse_event('done', {"usage": usage})
+    except Exception as e:
+        current_app.logger.error(f"Error streaming chat completion: {str(e)}")
+        yield sse_event('error', {"error": str(e)})
+
 @ai_bp.route('/chat', methods=['POST'])
 def chat():
     """
@@ -40,7 +62,8 @@ def chat():
             {"role": "user", "content": "How do I save for a house?"}
         ],
         "model": "gpt-4o-mini",  # Optional
-        "max_tokens": 500  # Optional
+        "max_tokens": 500,  # Optional
+        "stream": true  # Optional, reply as server-sent events
     }
     """
     data = request.json
@@ -48,137 +71,75 @@ def chat():
     if not data or "messages" not in data:
         return jsonify({"error": "Missing 'messages' field in request body"}), 400
 
+    completion_args = dict(
+        model=data.get('model', 'gpt-3.5-turbo'),
+        messages=data['messages'],
+        max_tokens=data.get('max_tokens', 200),
+        temperature=0.7  # Control creativity
+    )
     try:
-        response = client.chat.completions.create(
-            model=data.get('model', 'gpt-3.5-turbo'),
-            messages=data['messages'],
-            max_tokens=data.get('max_tokens', 200),
-            temperature=0.7  # Control creativity
-        )
+        stream = parse_bool(data.get('stream', request.args.get('stream')))
+    except ValueError:
+        return jsonify({"error": "stream must be true or false"}), 400
+
+    try:
+        if stream:
+            chunks = get_gateway().stream_chat_completion(
+                stream_options={"include_usage": True},
+                **completion_args
+            )
+            return Response(
+                stream_with_context(stream_chat(chunks)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        response = get_gateway().chat_completion(**completion_args)
         return jsonify({
             "reply": response.choices[0].message.content,
-            "usage": response.usage
+            "usage": response.usage.model_dump() if response.usage else None
         })
     
+    except GatewayBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except GatewayTimeout as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def get_financial_summary():
-    """Get enhanced financial summary with ratios and benchmarks"""
-    # Get current month and year
-    now = datetime.now()
-    current_month = now.month
-    current_year = now.year
-    
-    # Get all transactions for current month
-    transactions = Transaction.query.filter(
-        Transaction.date.like(f'{current_year}-{current_month:02d}%')
-    ).all()
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.is_income)
-    total_expenses = sum(t.amount for t in transactions if not t.is_income)
-    
-    # Define spending benchmarks (percentage of income)
-    benchmarks = {
-        'Housing': 30,
-        'Food': 15,
-        'Transportation': 15,
-        'Entertainment': 5,
-        'Utilities': 10,
-        'Education': 10,
-        'Other': 15
-    }
-    
-    # Initialize category structure
-    categories = {
-        category: {
-            'total': 0,
-            'percentage_of_income': 0,
-            'benchmark': benchmarks[category],
-            'over_benchmark': False
-        } 
-        for category in benchmarks
-    }
-    
-    # Calculate spending by category
-    for t in transactions:
-        if not t.is_income:
-            category = t.category if t.category in benchmarks else 'Other'
-            categories[category]['total'] += t.amount
-    
-    # Calculate percentages and benchmark comparisons
-    for category in categories:
-        if total_income > 0:
-            percentage = (categories[category]['total'] / total_income) * 100
-            categories[category]['percentage_of_income'] = round(percentage, 1)
-            categories[category]['over_benchmark'] = percentage > categories[category]['benchmark']
-    
-    # Calculate savings
-    savings = total_income - total_expenses
-    savings_rate = round((savings / total_income * 100), 1) if total_income > 0 else 0
-    
-    # Identify top 3 expenses
-    sorted_categories = sorted(
-        categories.items(),
-        key=lambda x: x[1]['total'],
-        reverse=True
-    )
-    top_expenses = [
-        {
-            'name': name,
-            'amount': data['total'],
-            'percentage': data['percentage_of_income']
-        } 
-        for name, data in sorted_categories[:3]
-    ]
-    
-    return {
-        'month': current_month,
-        'year': current_year,
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'savings': savings,
-        'savings_rate': savings_rate,
-        'categories': categories,
-        'benchmarks': benchmarks,
-        'top_expenses': top_expenses,
-        'transaction_count': len(transactions),
-        'analysis_ready': total_income > 0  # Flag for whether analysis is possible
-    }
-
 @ai_bp.route('/api', methods=['GET'])
 def get_ai_insights():
     try:
-        current_time = time.time()
+        email = request.args.get('email')
+        now = datetime.now()
         
-        # Check if we have a cached response and it's still valid
-        if last_api_call['response'] and (current_time - last_api_call['time'] < CACHE_DURATION):
+        # Keyed by user, month and that month's write counter, so any
+        # change to the user's transactions misses the cache
+        version = month_version(now.year, now.month, email)
+        cache_key = f"insights:{email or '*'}:{now.year}-{now.month:02d}:{version}"
+        cache = insights_cache()
+        cached = cache.get(cache_key)
+        metrics.record_cache('insights', cached is not None)
+        if cached is not None:
             print("Returning cached response")
-            return jsonify(last_api_call['response'])
-        
-        print("Fetching new AI insights...")
-        # Get financial summary
-        financial_data = get_financial_summary()
-        print("Financial data:", json.dumps(financial_data, indent=2))
+            return jsonify(cached)
         
-        # Return mock data instead of making API call
-        mock_response = {
-            "good_habits": [
-                f"You're saving {financial_data['savings_rate']:.1f}% of your income, which is above the recommended 20%",
-                f"Your {max(financial_data['categories'].items(), key=lambda x: x[1]['total'])[0]} spending is well-managed at {max(financial_data['categories'].items(), key=lambda x: x[1]['percentage_of_income'])[1]['percentage_of_income']:.1f}% of your income"
-            ],
-            "bad_habits": [
-                f"Your {max(financial_data['categories'].items(), key=lambda x: x[1]['total'])[0]} spending is high at {max(financial_data['categories'].items(), key=lambda x: x[1]['percentage_of_income'])[1]['percentage_of_income']:.1f}% of your income, consider reviewing this category",
-                f"Your savings rate of {financial_data['savings_rate']:.1f}% is below the recommended 20%"
-            ]
-        }
+        # Normally precomputed; built here only when the month has no row yet
+        row = stored_insights(now.year, now.month, email)
+        if row is None:
+            current_app.logger.info(f"Computing AI insights on demand for {now.year}-{now.month:02d}")
+            version, insights = compute_insights(now.year, now.month, email)
+            store_insights(now.year, now.month, [(email or '', version, insights)])
+        elif row.version != version:
+            # Transactions changed since: serve the stored insights and refresh them in the background
+            schedule_insights_refresh(current_app._get_current_object(), {email or '': {(now.year, now.month)}})
+            return jsonify(row.insights)
+        else:
+            insights = row.insights
         
-        print("Returning mock insights:", json.dumps(mock_response, indent=2))
         # Cache the response
-        last_api_call['time'] = current_time
-        last_api_call['response'] = mock_response
-        return jsonify(mock_response)
+        cache.set(cache_key, insights)
+        return jsonify(insights)
         
     except Exception as e:
         print("Error generating mock insights:", str(e))
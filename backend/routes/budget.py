@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import Budget, Transaction
+from models import Budget
+from services.budget_engine import budget_statuses
 
 budget_bp = Blueprint('budget', __name__)
 
@@ -17,16 +18,15 @@ def set_budget():
 
 @budget_bp.route('/status', methods=['GET'])
 def budget_status():
-    budget = Budget.query.first()  # Demo: Get first budget
-    transactions = Transaction.query.filter_by(is_income=False).all()
+    email = request.args.get('email')
+    query = Budget.query
+    if email:
+        query = query.filter_by(user_email=email)
+    budget = query.first()  # Demo: Get first budget when no email is given
+    if budget is None:
+        return jsonify({"error": "No budget found"}), 404
     
-    status = {}
-    for category, limit in budget.category_limits.items():
-        spent = sum(t.amount for t in transactions if t.category == category)
-        status[category] = {
-            "limit": limit,
-            "spent": spent,
-            "remaining": limit - spent
-        }
+    # Spent per category over the budget's own period, for its own user
+    status = budget_statuses([budget])[budget.id]
     
     return jsonify(status)
\ No newline at end of file
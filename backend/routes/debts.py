@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from extensions import db
 from models import Debt
+from services.amortization import debt_schedules, debt_arrays, MAX_MONTHS
+from services.payoff_strategies import compare_strategies, STRATEGIES, MAX_BUDGET_LEVELS
+import math
+import numpy as np
+import traceback
 
 debts_bp = Blueprint('debts', __name__)
 
@@ -18,4 +23,96 @@ def get_debts():
 def total_minimum_payments():
     debts = Debt.query.all()
     total = sum(d.minimum_payment for d in debts)
-    return jsonify({"total_minimum_payments": total})
\ No newline at end of file
+    return jsonify({"total_minimum_payments": total})
+
+@debts_bp.route('/schedule', methods=['GET'])
+def get_schedule():
+    """Amortization schedules, payoff dates and total interest for all of a user's debts.
+
+    Optional query params: email, extra (added to every debt's monthly
+    payment) and months (schedule horizon).
+    """
+    try:
+        try:
+            extra = float(request.args.get('extra', 0))
+            months = int(request.args.get('months', MAX_MONTHS))
+        except ValueError:
+            return jsonify({"error": "extra must be a number and months an integer"}), 400
+        if not math.isfinite(extra) or extra < 0 or not 1 <= months <= MAX_MONTHS:
+            return jsonify({"error": f"extra must be a finite number >= 0 and months between 1 and {MAX_MONTHS}"}), 400
+        
+        query = Debt.query
+        email = request.args.get('email')
+        if email:
+            query = query.filter_by(user_email=email)
+        debts = query.order_by(Debt.id).all()
+        
+        return jsonify(debt_schedules(debts, extra, months))
+    
+    except Exception as e:
+        current_app.logger.error(f"Error computing debt schedule: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+
+@debts_bp.route('/strategies', methods=['POST'])
+def compare_payoff_strategies():
+    """
+    Expected payload (all optional):
+    {
+        "email": "user@example.com",
+        "budgets": [600, 700, 800],  # or budget_min/budget_max/steps
+        "budget_min": 600, "budget_max": 1800, "steps": 200,
+        "strategies": ["avalanche", "snowball", "custom"],
+        "custom_order": [3, 1, 2],  # debt ids, paid first to last
+        "months": 600
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        query = Debt.query
+        if data.get('email'):
+            query = query.filter_by(user_email=data['email'])
+        debts = query.order_by(Debt.id).all()
+        
+        strategies = data.get('strategies') or list(STRATEGIES)
+        unknown = [s for s in strategies if s not in STRATEGIES]
+        if unknown:
+            return jsonify({"error": f"Unknown strategies: {', '.join(map(str, unknown))}"}), 400
+        
+        try:
+            months = int(data.get('months', MAX_MONTHS))
+            # Checked before any array is built
+            levels = len(data['budgets']) if 'budgets' in data else int(data.get('steps', 200))
+        except (TypeError, ValueError):
+            return jsonify({"error": "budgets must be a list, and steps and months numbers"}), 400
+        if not 1 <= levels <= MAX_BUDGET_LEVELS:
+            return jsonify({"error": f"Give between 1 and {MAX_BUDGET_LEVELS} budget levels"}), 400
+        try:
+            if 'budgets' in data:
+                budgets = np.array([float(b) for b in data['budgets']])
+            else:
+                # Default curve: from the sum of minimums up to three times that
+                minimum_total = float(debt_arrays(debts)[2].sum()) if debts else 0.0
+                budget_min = float(data.get('budget_min', minimum_total))
+                budget_max = float(data.get('budget_max', max(budget_min * 3, budget_min + 100)))
+                if not np.isfinite([budget_min, budget_max]).all():
+                    raise ValueError("budget_min and budget_max must be finite")
+                budgets = np.linspace(budget_min, budget_max, levels)
+        except (TypeError, ValueError):
+            return jsonify({"error": "budgets, budget_min and budget_max must be numbers"}), 400
+        if (budgets < 0).any() or not np.isfinite(budgets).all():
+            return jsonify({"error": "Budget levels must be non-negative numbers"}), 400
+        if not 1 <= months <= MAX_MONTHS:
+            return jsonify({"error": f"months must be between 1 and {MAX_MONTHS}"}), 400
+        custom_order = data.get('custom_order')
+        if custom_order is not None and not (
+            isinstance(custom_order, list)
+            and all(isinstance(debt_id, int) and not isinstance(debt_id, bool) for debt_id in custom_order)
+        ):
+            return jsonify({"error": "custom_order must be a list of debt ids"}), 400
+        
+        return jsonify(compare_strategies(debts, budgets, strategies, custom_order, months))
+    
+    except Exception as e:
+        current_app.logger.error(f"Error comparing payoff strategies: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
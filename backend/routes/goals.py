@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from extensions import db
 from models.goal import Goal
+from services.goal_simulation import run_projection, DEFAULT_HORIZON, DEFAULT_PATHS, MAX_HORIZON, MAX_PATHS
+from services.goal_planner import run_plan, DEFAULT_HORIZON as PLAN_HORIZON, MAX_HORIZON as PLAN_MAX_HORIZON
+from services.queries import parse_bool
+import traceback
 
 goals_bp = Blueprint('goals', __name__)
 
@@ -30,4 +34,54 @@ def list_goals():
         "deadline": g.deadline
     } for g in goals])
 
-# Add PUT/DELETE endpoints as needed
\ No newline at end of file
+# Add PUT/DELETE endpoints as needed
+
+@goals_bp.route('/projection', methods=['GET'])
+def project_goals():
+    """Monte Carlo odds of reaching each open goal by its target date"""
+    try:
+        email = request.args.get('email')
+        try:
+            paths = int(request.args.get('paths', DEFAULT_PATHS))
+            months = int(request.args.get('months', DEFAULT_HORIZON))
+            seed = request.args.get('seed')
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            return jsonify({"error": "paths, months and seed must be integers"}), 400
+        if not 1 <= paths <= MAX_PATHS:
+            return jsonify({"error": f"paths must be between 1 and {MAX_PATHS}"}), 400
+        if not 1 <= months <= MAX_HORIZON:
+            return jsonify({"error": f"months must be between 1 and {MAX_HORIZON}"}), 400
+        if seed is not None and seed < 0:
+            return jsonify({"error": "seed must not be negative"}), 400
+        
+        try:
+            return jsonify(run_projection(email, paths, months, seed, current_app.config.get('GOAL_SIMULATION_SECONDS')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        current_app.logger.error(f"Error projecting goals: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+
+@goals_bp.route('/plan', methods=['GET'])
+def plan_goals():
+    """Month-by-month split of the monthly surplus across open goals (all users without email)"""
+    try:
+        email = request.args.get('email')
+        try:
+            include_debts = parse_bool(request.args.get('include_debts'))
+        except ValueError:
+            return jsonify({"error": "include_debts must be true or false"}), 400
+        try:
+            months = int(request.args.get('months', PLAN_HORIZON))
+        except ValueError:
+            return jsonify({"error": "months must be an integer"}), 400
+        if not 1 <= months <= PLAN_MAX_HORIZON:
+            return jsonify({"error": f"months must be between 1 and {PLAN_MAX_HORIZON}"}), 400
+        
+        return jsonify(run_plan([email] if email else None, months, include_debts))
+    
+    except Exception as e:
+        current_app.logger.error(f"Error planning goals: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
@@ -1,36 +1,119 @@
+import csv
+import io
+import json
+import math
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import insert
 from extensions import db
 from models import Transaction
+from models.monthly_category_total import rollup_key, add_delta, apply_monthly_deltas
+from services.queries import (
+    TRANSACTION_FIELDS, month_range, transactions_between, parse_bool,
+    project, serialize_row, decode_cursor, keyset_page
+)
+from services.rollups import monthly_totals
+from services.insights import schedule_insights_refresh
+from services.recurring import merchant_key, refresh_recurring
+from services.categorizer import PendingLabels, categorize_rows
 import traceback
 
 transactions_bp = Blueprint('transactions', __name__)
 
+# Page size for cursor pagination on GET /api/transactions
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip and flushed per chunk when streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+# Rows sent per executemany when bulk inserting
+BULK_INSERT_CHUNK_SIZE = 500
+
+def transaction_values(data):
+    """Validate a transaction payload and return its column values.
+
+    Raises ValueError with a client-facing message when the payload is invalid.
+    """
+    if not isinstance(data, dict) or 'name' not in data or 'amount' not in data:
+        raise ValueError("Missing required fields")
+    if not isinstance(data['name'], str) or not data['name'].strip():
+        raise ValueError(f"Invalid name: {data['name']!r}")
+    try:
+        amount = float(data['amount'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {data['amount']!r}")
+    if not math.isfinite(amount):
+        raise ValueError(f"Invalid amount: {data['amount']!r}")
+    for field in ('category', 'email'):
+        if not isinstance(data.get(field), (str, type(None))):
+            raise ValueError(f"Invalid {field}: {data[field]!r}")
+    
+    transaction_date = data.get('date')
+    if transaction_date is None:
+        transaction_date = datetime.utcnow().date()  # Default to today if not provided
+    else:
+        try:
+            transaction_date = datetime.fromisoformat(str(transaction_date)).date()
+        except ValueError:
+            raise ValueError(f"Invalid date: {transaction_date!r}")
+    try:
+        is_income = parse_bool(data.get('is_income'))
+    except ValueError:
+        raise ValueError(f"Invalid is_income: {data['is_income']!r}")
+    
+    return {
+        'name': data['name'],
+        'amount': amount,
+        'is_income': is_income,
+        'category': data.get('category') or None,  # filled in by categorize_rows
+        'user_email': data.get('email', 'demo@user.com'),
+        'date': transaction_date
+    }
+
+def parse_fields(fields_param):
+    """Parse a comma-separated `fields=` argument; raises ValueError on unknown names."""
+    if not fields_param:
+        return list(TRANSACTION_FIELDS)
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in TRANSACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def update_recurring(merchants_by_user):
+    """Re-detect recurring series after an insert, given {user_email: {merchant_key}}.
+
+    The transactions are already committed, so a failure here is logged
+    and never changes the response.
+    """
+    for user_email, merchants in merchants_by_user.items():
+        try:
+            refresh_recurring(user_email, merchants)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"Recurring detection failed for {user_email}: {str(e)}")
+
 @transactions_bp.route('', methods=['POST'])
 def add_transaction():
     try:
         data = request.get_json()
         
-        # Validate required fields
-        if not data or 'name' not in data or 'amount' not in data:
-            return jsonify({"error": "Missing required fields"}), 400
-            
-        # Create new transaction
-        transaction = Transaction(
-            name=data['name'],
-            amount=float(data['amount']),
-            is_income=data.get('is_income', False),
-            category=data.get('category', 'other'),
-            user_email=data.get('email', 'demo@user.com'),
-            date=data.get('date', datetime.utcnow().date())  # Default to today if not provided
-        )
+        try:
+            values = transaction_values(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        labels = PendingLabels()
+        transaction = Transaction(**categorize_rows([values], labels)[0])
         
         db.session.add(transaction)
         db.session.commit()
+        labels.learn()
+        update_recurring({transaction.user_email: {merchant_key(transaction.name)}})
         
         return jsonify({
             "message": "Transaction added",
-            "transaction": transaction.to_dict()
+            "transaction": serialize_row(transaction, TRANSACTION_FIELDS)
         }), 201
         
     except Exception as e:
@@ -38,6 +121,98 @@ def add_transaction():
         current_app.logger.error(f"Error adding transaction: {str(e)}\n{traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
 
+def bulk_payload_items():
+    """Yield the raw transaction dicts of a bulk request.
+
+    Accepts a JSON array (or {"transactions": [...]}) or, with an
+    application/x-ndjson body, one JSON object per line read off the stream.
+    Lines that are not valid JSON are yielded as ValueError instances so they
+    are reported like any other invalid row.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield ValueError(f"Invalid JSON: {str(e)}")
+        return
+    
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get('transactions')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of transactions")
+    yield from data
+
+@transactions_bp.route('/bulk', methods=['POST'])
+def add_transactions_bulk():
+    """Insert many transactions in a single database transaction.
+
+    Invalid rows are reported by index and skipped; the valid ones are
+    written with executemany in chunks and committed once.
+    """
+    def insert_chunk(rows):
+        categorize_rows(rows, labels)
+        db.session.execute(insert(Transaction), rows)
+        # Core inserts skip the ORM events that maintain the monthly rollup
+        deltas = {}
+        for row in rows:
+            key = rollup_key(row['user_email'], row['date'], row['category'], row['is_income'])
+            add_delta(deltas, key, row['amount'], 1)
+            if key is not None:
+                touched_months.setdefault(key[0], set()).add((key[1], key[2]))
+                touched_merchants.setdefault(row['user_email'], set()).add(merchant_key(row['name']))
+        apply_monthly_deltas(db.session.connection(), deltas)
+    
+    # {user_email: {(year, month)}} whose precomputed insights are now stale
+    touched_months = {}
+    # {user_email: {merchant_key}} whose recurring series need another look
+    touched_merchants = {}
+    # Categories given in the payload, learned once the import commits
+    labels = PendingLabels()
+    try:
+        inserted = 0
+        errors = []
+        pending = []
+        for index, data in enumerate(bulk_payload_items()):
+            try:
+                if isinstance(data, ValueError):
+                    raise data
+                pending.append(transaction_values(data))
+            except ValueError as e:
+                errors.append({"index": index, "error": str(e)})
+                continue
+            if len(pending) >= BULK_INSERT_CHUNK_SIZE:
+                insert_chunk(pending)
+                inserted += len(pending)
+                pending = []
+        if pending:
+            insert_chunk(pending)
+            inserted += len(pending)
+        db.session.commit()
+        labels.learn()
+        schedule_insights_refresh(current_app._get_current_object(), touched_months)
+        update_recurring(touched_merchants)
+        
+        current_app.logger.info(f"Bulk insert: {inserted} inserted, {len(errors)} rejected")
+        
+        return jsonify({
+            "message": "Transactions added",
+            "inserted": inserted,
+            "errors": errors
+        }), 201 if inserted else 400
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error adding transactions: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+
 @transactions_bp.route('', methods=['GET'])
 def get_transactions():
     try:
@@ -45,8 +220,27 @@ def get_transactions():
         month = request.args.get('month', type=int)
         year = request.args.get('year', type=int)
         category = request.args.get('category')
+        email = request.args.get('email')
+        fields_param = request.args.get('fields')
+        # Passing a cursor (empty for the first page) switches to keyset pagination
+        cursor_param = request.args.get('cursor')
+        
+        current_app.logger.info(f"Fetching transactions for month={month}, year={year}, category={category}, email={email}")
+        
+        try:
+            fields = parse_fields(fields_param)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        current_app.logger.info(f"Fetching transactions for month={month}, year={year}, category={category}")
+        if cursor_param is not None:
+            limit = request.args.get('limit', type=int, default=DEFAULT_PAGE_SIZE)
+            if limit < 1:
+                return jsonify({"error": "Limit must be a positive integer"}), 400
+            limit = min(limit, MAX_PAGE_SIZE)
+            try:
+                cursor = decode_cursor(cursor_param) if cursor_param else None
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         
         # Validate month and year if provided
         if month is not None:
@@ -57,72 +251,116 @@ def get_transactions():
             if not 2000 <= year <= datetime.utcnow().year:
                 return jsonify({"error": "Year must be between 2000 and current year"}), 400
         
-        # Base query
-        query = Transaction.query
-        
         # Apply filters
         if month and year:
             # Use date range to ensure we get all transactions in the month
-            start_date = datetime(year, month, 1).date()
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1).date()
-            else:
-                end_date = datetime(year, month + 1, 1).date()
+            start_date, end_date = month_range(year, month)
             
             current_app.logger.info(f"Filtering transactions between {start_date} and {end_date}")
             
-            query = query.filter(
-                Transaction.date >= start_date,
-                Transaction.date < end_date
-            )
+            query = transactions_between(start_date, end_date, email)
         elif month or year:
             # If only one of month or year is provided, return error
             return jsonify({"error": "Both month and year must be provided together"}), 400
+        else:
+            query = Transaction.query
+            if email:
+                query = query.filter_by(user_email=email)
             
         if category:
             query = query.filter_by(category=category)
             
-        # Order by date descending (most recent first)
-        transactions = query.order_by(Transaction.date.desc()).all()
+        # Only the requested columns are selected, never full ORM entities
+        query = project(query, fields)
         
-        current_app.logger.info(f"Found {len(transactions)} transactions")
+        if cursor_param is not None:
+            rows, next_cursor = keyset_page(query, cursor, limit)
+        else:
+            # Order by date descending (most recent first)
+            rows = query.order_by(Transaction.date.desc(), Transaction.id.desc()).all()
         
-        # Convert transactions to dictionary format
-        transactions_list = []
-        for t in transactions:
-            try:
-                transaction_dict = {
-                    'id': t.id,
-                    'name': t.name,
-                    'amount': float(t.amount),
-                    'is_income': bool(t.is_income),
-                    'category': t.category or 'other',
-                    'date': t.date.strftime('%Y-%m-%d') if t.date else None,
-                    'payment_method': t.payment_method,
-                    'recurring': bool(t.recurring)
-                }
-                transactions_list.append(transaction_dict)
-            except Exception as e:
-                current_app.logger.error(f"Error converting transaction {t.id}: {str(e)}")
-                continue
-        print(transactions_list)
-        return jsonify({
+        current_app.logger.info(f"Found {len(rows)} transactions")
+        
+        transactions_list = [serialize_row(row, fields) for row in rows]
+        result = {
             'transactions': transactions_list,
             'count': len(transactions_list),
             'month': month,
             'year': year
-        })
+        }
+        if cursor_param is not None:
+            result['limit'] = limit
+            result['next_cursor'] = next_cursor
+        return jsonify(result)
         
     except Exception as e:
         current_app.logger.error(f"Error fetching transactions: {str(e)}\n{traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
 
+@transactions_bp.route('/export', methods=['GET'])
+def export_transactions():
+    """Stream a user's full transaction history as NDJSON or CSV.
+
+    Rows are pulled from the database in batches of EXPORT_BATCH_SIZE and
+    written out as they arrive, so memory stays flat however long the
+    history is.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    email = request.args.get('email')
+    category = request.args.get('category')
+    
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "Format must be 'ndjson' or 'csv'"}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query = Transaction.query
+    if email:
+        query = query.filter_by(user_email=email)
+    if category:
+        query = query.filter_by(category=category)
+    rows = project(query, fields).order_by(
+        Transaction.date, Transaction.id
+    ).yield_per(EXPORT_BATCH_SIZE)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == 'csv' else None
+        if writer:
+            writer.writerow(fields)
+        try:
+            for i, row in enumerate(rows, 1):
+                record = serialize_row(row, fields)
+                if writer:
+                    writer.writerow(record.values())
+                else:
+                    buffer.write(json.dumps(record) + '\n')
+                if i % EXPORT_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        except Exception as e:
+            # Headers are already sent, so the client sees a truncated body
+            current_app.logger.error(f"Error exporting transactions: {str(e)}\n{traceback.format_exc()}")
+            raise
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transactions.{export_format}'}
+    )
+
 @transactions_bp.route('/summary', methods=['GET'])
 def get_summary():
     try:
         # Get and validate month and year parameters
         month = request.args.get('month', type=int, default=datetime.utcnow().month)
         year = request.args.get('year', type=int, default=datetime.utcnow().year)
+        email = request.args.get('email')
         
         # Validate month and year
         if not 1 <= month <= 12:
@@ -131,38 +369,28 @@ def get_summary():
             return jsonify({"error": "Year must be between 2000 and current year"}), 400
         
         # Use date range to ensure we get all transactions in the month
-        start_date = datetime(year, month, 1).date()
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1).date()
-        else:
-            end_date = datetime(year, month + 1, 1).date()
-        
-        current_app.logger.info(f"Fetching summary for transactions between {start_date} and {end_date}")
+        current_app.logger.info(f"Fetching summary for {year}-{month:02d}")
         
-        transactions = Transaction.query.filter(
-            Transaction.date >= start_date,
-            Transaction.date < end_date
-        ).all()
-        
-        # Calculate totals
-        income = sum(float(t.amount) for t in transactions if t.is_income)
-        expenses = sum(float(t.amount) for t in transactions if not t.is_income)
+        # One row per (is_income, category), read from the monthly rollup
+        income = 0
+        expenses = 0
+        category_breakdown = {}
+        for is_income, category, total, _ in monthly_totals(year, month, email):
+            if is_income:
+                income += float(total)
+            else:
+                expenses += float(total)
+                category = category or 'other'
+                category_breakdown[category] = category_breakdown.get(category, 0) + float(total)
         net = income - expenses
         
-        # Calculate category breakdown
-        category_totals = {}
-        for t in transactions:
-            if not t.is_income:
-                category = t.category or 'other'
-                category_totals[category] = category_totals.get(category, 0) + float(t.amount)
-        
         return jsonify({
             "income": income,
             "expenses": expenses,
             "net": net,
             "month": month,
             "year": year,
-            "category_breakdown": category_totals
+            "category_breakdown": category_breakdown
         })
         
     except Exception as e:
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify, current_app
+from services.whatif import parse_scenario, run_whatif, DEFAULT_HORIZON, MAX_HORIZON, MAX_SCENARIOS
+import traceback
+
+whatif_bp = Blueprint('whatif', __name__)
+
+@whatif_bp.route('', methods=['POST'])
+def evaluate_scenarios():
+    """
+    Expected payload:
+    {
+        "email": "user@example.com",  # optional
+        "months": 60,                 # optional projection horizon
+        "scenarios": [
+            {"name": "New Car", "amount": 300, "recurring": "monthly", "duration": 60, "is_income": false},
+            {"name": "Vacation", "amount": 1500, "recurring": "once", "start_month": 6}
+        ]
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        raw_scenarios = data.get('scenarios')
+        if not isinstance(raw_scenarios, list) or not 1 <= len(raw_scenarios) <= MAX_SCENARIOS:
+            return jsonify({"error": f"scenarios must be a list of 1 to {MAX_SCENARIOS} scenarios"}), 400
+        try:
+            scenarios = [parse_scenario(s if isinstance(s, dict) else {}) for s in raw_scenarios]
+            months = int(data.get('months', DEFAULT_HORIZON))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not 1 <= months <= MAX_HORIZON:
+            return jsonify({"error": f"months must be between 1 and {MAX_HORIZON}"}), 400
+        
+        return jsonify(run_whatif(scenarios, data.get('email'), months))
+    
+    except Exception as e:
+        current_app.logger.error(f"Error evaluating what-if scenarios: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
@@ -2,6 +2,7 @@ import random
 from datetime import datetime, timedelta
 from models import db, User, Transaction, Goal, Debt, Budget
 from app import create_app
+from services.rollups import rebuild_monthly_totals
 
 app = create_app()
 
@@ -95,6 +96,9 @@ def seed_database():
             db.session.add(budget)
             
             db.session.commit()
+            
+            # The bulk deletes above bypass the rollup events
+            rebuild_monthly_totals()
             print("✅ Database seeded successfully!")
             
         except Exception as e:
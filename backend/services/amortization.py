@@ -0,0 +1,142 @@
+from datetime import date
+import numpy as np
+
+# Longest schedule computed, in months (50 years)
+MAX_MONTHS = 600
+
+# Balances below this are treated as paid off (float noise from the closed form)
+PAID_OFF = 0.005
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def first_payment_month(today=None):
+    """Payments are scheduled from the first of next month."""
+    return add_months(today or date.today(), 1)
+
+
+def debt_balance(debt):
+    if debt.remaining_balance is not None:
+        return debt.remaining_balance
+    return (debt.principal or 0) - (debt.amount_paid or 0)
+
+
+def debt_arrays(debts):
+    """(balance, monthly_rate, payment) arrays with one entry per debt.
+
+    interest_rate is an annual percentage. Debts without a minimum payment
+    are given the level payment that clears them in term_months.
+    """
+    balance = np.array([max(debt_balance(d), 0) for d in debts], dtype=float)
+    rate = np.array([(d.interest_rate or 0) / 100 / 12 for d in debts], dtype=float)
+    minimum = np.array([d.minimum_payment or 0 for d in debts], dtype=float)
+    term = np.array([d.term_months or 0 for d in debts], dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level = np.where(
+            rate > 0,
+            balance * rate / (1 - (1 + rate) ** -np.maximum(term, 1)),
+            balance / np.maximum(term, 1)
+        )
+    payment = np.where((minimum <= 0) & (term > 0), level, minimum)
+    return balance, rate, payment
+
+
+def amortize(balance, rate, payment, months=MAX_MONTHS):
+    """Amortization schedules for many debts at once.
+
+    Takes one entry per debt and returns (n_debts, months) arrays of the
+    balance after each month's payment and the payment, interest and principal
+    paid that month, using the closed form for a fixed payment instead of
+    stepping month by month. A payment at or below the monthly interest never
+    pays the debt off; its balance grows for the whole horizon.
+    """
+    balance = np.asarray(balance, dtype=float)[:, None]
+    rate = np.asarray(rate, dtype=float)[:, None]
+    payment = np.asarray(payment, dtype=float)[:, None]
+    t = np.arange(1, months + 1, dtype=float)[None, :]
+
+    growth = (1 + rate) ** t
+    # Future value of one unit paid every month for t months
+    annuity = np.where(rate > 0, (growth - 1) / np.where(rate > 0, rate, 1), t)
+    remaining = balance * growth - payment * annuity
+    remaining = np.where(remaining < PAID_OFF, 0.0, remaining)
+
+    previous = np.concatenate([balance, remaining[:, :-1]], axis=1)
+    interest = previous * rate
+    paid = np.where(previous > 0, np.minimum(payment, previous + interest), 0.0)
+    return {
+        'balance': remaining,
+        'payment': paid,
+        'interest': interest,
+        'principal': paid - interest
+    }
+
+
+def payoff_months(balance, schedule):
+    """Months until each debt is paid off (0 if already clear, -1 if not within the schedule)."""
+    paid_off = schedule['balance'] <= 0
+    months = np.where(paid_off.any(axis=1), paid_off.argmax(axis=1) + 1, -1)
+    return np.where(np.asarray(balance) <= 0, 0, months)
+
+
+def debt_schedules(debts, extra_payment=0, months=MAX_MONTHS, today=None):
+    """Schedules, payoff dates and total interest for a list of Debt rows.
+
+    `extra_payment` is added to every debt's monthly payment. Each schedule
+    is returned as columns (one list per field) cut at the payoff month.
+    """
+    start = first_payment_month(today)
+    if not debts:
+        return {
+            'start': start.isoformat(),
+            'debts': [],
+            'totals': {'monthly_payment': 0, 'total_interest': 0, 'total_paid': 0,
+                       'months_to_payoff': 0, 'debt_free_date': None}
+        }
+
+    balance, rate, payment = debt_arrays(debts)
+    payment = payment + extra_payment
+    schedule = amortize(balance, rate, payment, months)
+    payoff = payoff_months(balance, schedule)
+    total_interest = schedule['interest'].sum(axis=1)
+    total_paid = schedule['payment'].sum(axis=1)
+
+    def columns(i, length):
+        return {
+            'date': [add_months(start, m).isoformat() for m in range(length)],
+            **{field: np.round(values[i, :length], 2).tolist() for field, values in schedule.items()}
+        }
+
+    results = []
+    for i, debt in enumerate(debts):
+        length = int(payoff[i]) if payoff[i] >= 0 else months
+        results.append({
+            'id': debt.id,
+            'name': debt.name,
+            'balance': round(float(balance[i]), 2),
+            'interest_rate': debt.interest_rate,
+            'monthly_payment': round(float(payment[i]), 2),
+            'months_to_payoff': int(payoff[i]) if payoff[i] >= 0 else None,
+            'payoff_date': add_months(start, int(payoff[i]) - 1).isoformat() if payoff[i] > 0 else None,
+            'total_interest': round(float(total_interest[i]), 2),
+            'total_paid': round(float(total_paid[i]), 2),
+            'schedule': columns(i, length)
+        })
+
+    all_paid = bool((payoff >= 0).all())
+    last = int(payoff.max()) if all_paid else None
+    return {
+        'start': start.isoformat(),
+        'debts': results,
+        'totals': {
+            'monthly_payment': round(float(payment.sum()), 2),
+            'total_interest': round(float(total_interest.sum()), 2),
+            'total_paid': round(float(total_paid.sum()), 2),
+            'months_to_payoff': last,
+            'debt_free_date': add_months(start, last - 1).isoformat() if last else None
+        }
+    }
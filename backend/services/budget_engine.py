@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+from sqlalchemy import func
+from extensions import db
+from models import Transaction
+from services.queries import month_range
+from services.rollups import monthly_spent_query
+
+# SQLite caps the number of bound parameters per statement
+EMAIL_CHUNK_SIZE = 500
+
+
+def period_range(period, today=None):
+    """Return the [start, end) dates of the budget period containing `today`."""
+    today = today or date.today()
+    if period == 'weekly':
+        start_date = today - timedelta(days=today.weekday())
+        return start_date, start_date + timedelta(days=7)
+    if period == 'yearly':
+        return date(today.year, 1, 1), date(today.year + 1, 1, 1)
+    return month_range(today.year, today.month)
+
+
+def spent_query(user_emails, start_date, end_date, categories=None):
+    """Grouped (user_email, category, total) expenses in [start_date, end_date)."""
+    query = db.session.query(
+        Transaction.user_email,
+        Transaction.category,
+        func.sum(Transaction.amount)
+    ).filter(
+        Transaction.user_email.in_(user_emails),
+        Transaction.date >= start_date,
+        Transaction.date < end_date,
+        Transaction.is_income == False
+    )
+    if categories is not None:
+        query = query.filter(Transaction.category.in_(categories))
+    return query.group_by(Transaction.user_email, Transaction.category)
+
+
+def spent_by_category(user_emails, start_date, end_date, categories=None):
+    """Expense totals keyed by (user_email, category) in [start_date, end_date)."""
+    user_emails = sorted(set(user_emails))
+    spent = {}
+    for i in range(0, len(user_emails), EMAIL_CHUNK_SIZE):
+        chunk = user_emails[i:i + EMAIL_CHUNK_SIZE]
+        if start_date.day == 1 and end_date.day == 1:
+            # Whole months (monthly and yearly budgets) read the rollup table
+            query = monthly_spent_query(chunk, start_date, end_date, categories)
+        else:
+            query = spent_query(chunk, start_date, end_date, categories)
+        for user_email, category, total in query:
+            spent[(user_email, category)] = float(total)
+    return spent
+
+
+def budget_status(budget, spent):
+    """Build the {category: {limit, spent, remaining}} payload for one budget."""
+    status = {}
+    for category, limit in (budget.category_limits or {}).items():
+        category_spent = spent.get((budget.user_email, category), 0)
+        status[category] = {
+            "limit": limit,
+            "spent": category_spent,
+            "remaining": limit - category_spent
+        }
+    return status
+
+
+def budget_statuses(budgets, today=None):
+    """Status of many budgets at once, keyed by budget id.
+
+    Budgets are grouped by their period window and each window is resolved
+    with a single grouped query, so the nightly alerting job costs one query
+    per distinct period rather than one per budget.
+    """
+    windows = {}
+    for budget in budgets:
+        windows.setdefault(period_range(budget.period, today), []).append(budget)
+
+    statuses = {}
+    for (start_date, end_date), group in windows.items():
+        categories = {category for b in group for category in (b.category_limits or {})}
+        spent = spent_by_category(
+            (b.user_email for b in group), start_date, end_date, categories
+        )
+        for budget in group:
+            statuses[budget.id] = budget_status(budget, spent)
+    return statuses
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+# /analyze answers: highlights of the static wiki pages repeat a lot, so they are kept for 30 days
+ANALYSIS_CACHE_ENTRIES = 100_000
+ANALYSIS_CACHE_TTL = 30 * 24 * 60 * 60
+ANALYSIS_CACHE_MAX_BYTES = 50 * 1024 * 1024
+# Part of every /analyze cache key; bump when the prompt or its parsing changes
+ANALYSIS_MODEL = "gpt-3.5-turbo"
+ANALYSIS_PROMPT_VERSION = 2
+
+# Least recently used entries dropped per statement once SQLiteCache is over max_bytes
+EVICT_BATCH = 64
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL.
+
+    Fast, but private to one worker process.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteCache:
+    """LRU cache with a per-entry TTL stored in a local SQLite file.
+
+    Every worker process on the host opening the same file shares the
+    entries. Values must be JSON serializable. Besides `max_entries`, the
+    total size of the stored values can be capped with `max_bytes`. Triggers
+    keep the entry count and byte total in `cache_size`, so a write only
+    evicts (oldest first) once a limit is passed instead of measuring the
+    whole table.
+    """
+
+    def __init__(self, path, max_entries=1024, ttl=300, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        with closing(self.connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_expires_at ON cache (expires_at)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_size ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'entries INTEGER NOT NULL, bytes INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache BEGIN '
+                'UPDATE cache_size SET entries = entries + 1, bytes = bytes + LENGTH(NEW.value); END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_updated AFTER UPDATE OF value ON cache BEGIN '
+                'UPDATE cache_size SET bytes = bytes + LENGTH(NEW.value) - LENGTH(OLD.value); END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache BEGIN '
+                'UPDATE cache_size SET entries = entries - 1, bytes = bytes - LENGTH(OLD.value); END'
+            )
+            # Counted once for files written before cache_size existed
+            conn.execute(
+                'INSERT OR IGNORE INTO cache_size (id, entries, bytes) '
+                'SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache'
+            )
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        now = time.time()
+        with closing(self.connect()) as conn, conn:
+            row = conn.execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with closing(self.connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                (key, json.dumps(value), now + self.ttl, now)
+            )
+            conn.execute('DELETE FROM cache WHERE expires_at < ?', (now,))
+            entries, size = conn.execute('SELECT entries, bytes FROM cache_size').fetchone()
+            if entries > self.max_entries:
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+                    (entries - self.max_entries,)
+                )
+            while self.max_bytes is not None and size > self.max_bytes:
+                # Drop least recently used entries until back within the size budget
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+                    (EVICT_BATCH,)
+                )
+                size = conn.execute('SELECT bytes FROM cache_size').fetchone()[0]
+
+    def delete(self, key):
+        with closing(self.connect()) as conn, conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        with closing(self.connect()) as conn, conn:
+            conn.execute('DELETE FROM cache')
+
+
+def create_cache(url, max_entries=1024, ttl=300, max_bytes=None):
+    """Build a cache from a URL: 'memory://' or 'sqlite:///path/to/cache.db'.
+
+    `max_bytes` only applies to the SQLite backend.
+    """
+    if url == 'memory://':
+        return MemoryCache(max_entries, ttl)
+    if url.startswith('sqlite:///'):
+        return SQLiteCache(url[len('sqlite:///'):], max_entries, ttl, max_bytes)
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+def analysis_cache_config(instance_path):
+    """ANALYSIS_CACHE_URL and ANALYSIS_CACHE_MAX_BYTES from the environment, or their defaults."""
+    return {
+        'ANALYSIS_CACHE_URL': os.getenv(
+            'ANALYSIS_CACHE_URL', f"sqlite:///{os.path.join(instance_path, 'analysis_cache.db')}"
+        ),
+        'ANALYSIS_CACHE_MAX_BYTES': int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', ANALYSIS_CACHE_MAX_BYTES)),
+    }
+
+
+def create_analysis_cache(config):
+    """The disk cache of /analyze answers, from a dict shaped like analysis_cache_config."""
+    return create_cache(
+        config['ANALYSIS_CACHE_URL'],
+        max_entries=ANALYSIS_CACHE_ENTRIES,
+        ttl=ANALYSIS_CACHE_TTL,
+        max_bytes=config['ANALYSIS_CACHE_MAX_BYTES']
+    )
+
+
+def content_key(*parts):
+    """Stable cache key for a tuple of JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
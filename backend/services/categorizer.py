@@ -0,0 +1,206 @@
+import math
+import threading
+from sqlalchemy import func
+from extensions import db
+from models import Transaction
+from services.cache import MemoryCache
+from services.recurring import merchant_key, merchant_tokens
+
+DEFAULT_CATEGORY = 'other'
+INCOME_CATEGORY = 'Income'
+
+# Merchant words and phrases that settle a category on their own
+CATEGORY_KEYWORDS = {
+    'Housing': ['rent', 'mortgage', 'apartments', 'property management', 'hoa', 'home depot', 'lowe', 'ikea'],
+    'Food': ['grocery', 'groceries', 'market', 'supermarket', 'safeway', 'kroger', 'trader joe', 'whole foods',
+             'aldi', 'costco', 'starbucks', 'dunkin', 'mcdonald', 'chipotle', 'subway', 'pizza', 'cafe',
+             'coffee', 'restaurant', 'doordash', 'grubhub', 'uber eats', 'instacart', 'bakery'],
+    'Transportation': ['uber', 'lyft', 'shell', 'chevron', 'exxon', 'bp', 'gas station', 'fuel', 'parking',
+                       'transit', 'metro', 'toll', 'amtrak', 'airlines', 'auto insurance', 'car wash', 'geico'],
+    'Entertainment': ['netflix', 'spotify', 'hulu', 'disney', 'hbo', 'youtube premium', 'steam', 'playstation',
+                      'xbox', 'nintendo', 'cinema', 'theater', 'theatre', 'concert', 'ticketmaster', 'amc'],
+    'Utilities': ['electric', 'electricity', 'power', 'water', 'sewer', 'gas company', 'energy', 'internet',
+                  'comcast', 'xfinity', 'verizon', 'at t', 'mobile', 'wireless', 't mobile', 'utility'],
+    'Education': ['tuition', 'university', 'college', 'school', 'coursera', 'udemy', 'textbook', 'bookstore',
+                  'student loan'],
+}
+
+# Smallest posterior probability at which the learned model's guess is used
+MODEL_CONFIDENCE = 0.6
+
+# Categorizers per user, rebuilt from the database after the TTL so labels from other workers show up
+categorizers = MemoryCache(max_entries=256, ttl=600)
+
+
+class KeywordTrie:
+    """Word-level trie of keyword phrases; finds the longest phrase inside a token list."""
+
+    def __init__(self, keywords=None):
+        self.root = {}
+        for category, phrases in (keywords or {}).items():
+            for phrase in phrases:
+                self.insert(phrase.split(), category)
+
+    def insert(self, words, category):
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        node[None] = category
+
+    def match(self, tokens):
+        """Category of the longest keyword phrase in tokens (earliest wins ties), or None."""
+        best, best_length = None, 0
+        for start in range(len(tokens)):
+            node = self.root
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node and end - start + 1 > best_length:
+                    best, best_length = node[None], end - start + 1
+        return best
+
+
+keyword_trie = KeywordTrie(CATEGORY_KEYWORDS)
+
+
+class Categorizer:
+    """One user's categorizer: their own labels first, then keywords, then a naive Bayes model.
+
+    Merchants the user has labelled before get the label they used most.
+    Unknown merchants are matched against the keyword trie, and otherwise
+    scored by a multinomial naive Bayes model over the words of the user's
+    labelled transaction names. Answers are memoized per merchant.
+    """
+
+    def __init__(self, labelled=()):
+        self.merchant_labels = {}
+        self.word_counts = {}
+        self.word_totals = {}
+        self.label_counts = {}
+        self.vocabulary = set()
+        self.memo = {}
+        self.lock = threading.Lock()
+        for name, category, count in labelled:
+            self.learn(name, category, count)
+
+    def learn(self, name, category, count=1):
+        """Add `count` transactions called `name` labelled with `category`."""
+        with self.lock:
+            labels = self.merchant_labels.setdefault(merchant_key(name), {})
+            labels[category] = labels.get(category, 0) + count
+            words = self.word_counts.setdefault(category, {})
+            for word in merchant_tokens(name):
+                words[word] = words.get(word, 0) + count
+                self.word_totals[category] = self.word_totals.get(category, 0) + count
+                self.vocabulary.add(word)
+            self.label_counts[category] = self.label_counts.get(category, 0) + count
+            self.memo.clear()
+
+    def model_category(self, tokens):
+        """Most likely category under the naive Bayes model, if it clears MODEL_CONFIDENCE."""
+        known = [word for word in tokens if word in self.vocabulary]
+        if not known:
+            return None
+        documents = sum(self.label_counts.values())
+        vocabulary = len(self.vocabulary)
+        scores = {}
+        for category, count in self.label_counts.items():
+            words = self.word_counts.get(category, {})
+            total = self.word_totals.get(category, 0)
+            scores[category] = math.log(count / documents) + sum(
+                math.log((words.get(word, 0) + 1) / (total + vocabulary)) for word in known
+            )
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        probability = 1 / sum(math.exp(score - top) for score in scores.values())
+        return best if probability >= MODEL_CONFIDENCE else None
+
+    def categorize(self, name, is_income=False):
+        """Category for a transaction name; DEFAULT_CATEGORY when nothing matches."""
+        key = (merchant_key(name), bool(is_income))
+        with self.lock:
+            if key in self.memo:
+                return self.memo[key]
+            labels = self.merchant_labels.get(key[0])
+            if labels:
+                category = max(labels, key=labels.get)
+            elif is_income:
+                category = INCOME_CATEGORY
+            else:
+                tokens = merchant_tokens(name)
+                category = keyword_trie.match(tokens) or self.model_category(tokens) or DEFAULT_CATEGORY
+            self.memo[key] = category
+            return category
+
+
+def labelled_history(user_email):
+    """(name, category, count) of a user's expenses whose category was set by hand."""
+    return db.session.query(
+        Transaction.name, Transaction.category, func.count(Transaction.id)
+    ).filter(
+        Transaction.user_email == user_email,
+        Transaction.category.isnot(None),
+        Transaction.category != DEFAULT_CATEGORY,
+        Transaction.auto_categorized.isnot(True),
+        Transaction.is_income.isnot(True)
+    ).group_by(Transaction.name, Transaction.category).all()
+
+
+def categorizer_for(user_email):
+    categorizer = categorizers.get(user_email)
+    if categorizer is None:
+        categorizer = Categorizer(labelled_history(user_email))
+        categorizers.set(user_email, categorizer)
+    return categorizer
+
+
+class PendingLabels:
+    """Labels seen in one request, taught to the shared categorizers only after it commits."""
+
+    def __init__(self):
+        self.counts = {}
+        self.merchants = {}
+
+    def add(self, user_email, name, category):
+        key = (user_email, name, category)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        labels = self.merchants.setdefault((user_email, merchant_key(name)), {})
+        labels[category] = labels.get(category, 0) + 1
+
+    def category(self, user_email, name):
+        """The label used most for this merchant so far in the request, or None."""
+        labels = self.merchants.get((user_email, merchant_key(name)))
+        return max(labels, key=labels.get) if labels else None
+
+    def learn(self):
+        """Teach the cached categorizers; ones not cached will read these rows from the database."""
+        for (user_email, name, category), count in self.counts.items():
+            categorizer = categorizers.get(user_email)
+            if categorizer is not None:
+                categorizer.learn(name, category, count)
+        self.counts.clear()
+
+
+def categorize_rows(rows, pending=None):
+    """Fill in `category` on transaction value dicts that have none, in place.
+
+    Rows that come with a category are collected in `pending` (shared by
+    every chunk of a bulk import), and win over the user's categorizer for
+    their merchant, so an import labels its unlabelled rows with what it has
+    just seen. Call pending.learn() once the rows are committed; nothing
+    reaches the shared categorizers before that. Filled rows get
+    auto_categorized=True and are never learned from.
+    """
+    pending = PendingLabels() if pending is None else pending
+    for row in rows:
+        if row.get('category') and row['category'] != DEFAULT_CATEGORY and not row['is_income']:
+            pending.add(row['user_email'], row['name'], row['category'])
+    for row in rows:
+        if row.get('category'):
+            row['auto_categorized'] = False
+        else:
+            category = None if row['is_income'] else pending.category(row['user_email'], row['name'])
+            row['category'] = category or categorizer_for(row['user_email']).categorize(row['name'], row['is_income'])
+            row['auto_categorized'] = True
+    return rows
@@ -0,0 +1,107 @@
+import math
+import re
+
+# Rough size of an English token for GPT models; good enough for budgeting
+CHARS_PER_TOKEN = 4
+# Paragraphs longer than this are split into sentences before scoring
+MAX_SPAN_TOKENS = 120
+GAP_MARKER = '...'
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def words(text):
+    return set(WORD.findall(text.lower()))
+
+
+def split_spans(text):
+    """Split text into (start, end) spans: paragraphs, or sentences of long paragraphs."""
+    spans = []
+    position = 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        start = text.index(paragraph, position)
+        position = start + len(paragraph)
+        if not paragraph.strip():
+            continue
+        if estimate_tokens(paragraph) <= MAX_SPAN_TOKENS:
+            spans.append((start, position))
+            continue
+        offset = start
+        for sentence in SENTENCE_END.split(paragraph):
+            offset = text.index(sentence, offset)
+            if sentence.strip():
+                spans.append((offset, offset + len(sentence)))
+            offset += len(sentence)
+    return spans
+
+
+def build_context(full_text, highlighted_text, token_budget, highlight_start=None, spans=None):
+    """Return the parts of full_text most relevant to the highlight, within token_budget.
+
+    Spans are scored by how close they sit to the highlight and by how many
+    of the highlight's words they share, then packed greedily best-first.
+    Spans covering the highlight itself are always kept. The chosen spans are
+    returned in document order with GAP_MARKER where text was left out.
+    `highlight_start` is the highlight's offset in full_text when the caller
+    knows it; otherwise the first exact match is used. Precomputed `spans`
+    (such as the paragraphs of an indexed wiki page) skip the splitting step;
+    their offsets must refer to full_text as given.
+    """
+    if estimate_tokens(full_text.strip()) <= token_budget:
+        return full_text.strip()
+
+    spans = spans or split_spans(full_text)
+    if not spans:
+        return ''
+    if highlight_start is None:
+        highlight_start = full_text.find(highlighted_text.strip())
+    highlight_words = words(highlighted_text)
+
+    def overlap(span):
+        if not highlight_words:
+            return 0.0
+        return len(highlight_words & words(full_text[span[0]:span[1]])) / len(highlight_words)
+
+    if highlight_start >= 0:
+        highlight_end = highlight_start + len(highlighted_text.strip())
+        anchors = [i for i, (start, end) in enumerate(spans)
+                   if start < highlight_end and end > highlight_start]
+    else:
+        # The highlight was not found verbatim (e.g. whitespace differs); anchor on the best match
+        anchors = [max(range(len(spans)), key=lambda i: overlap(spans[i]))]
+    anchors = anchors or [0]
+
+    scores = {}
+    for i, span in enumerate(spans):
+        distance = min(abs(i - anchor) for anchor in anchors)
+        scores[i] = 1.0 / (1 + distance) + overlap(span)
+
+    def cost(i):
+        # One extra token for the separator or gap marker next to each span
+        return estimate_tokens(full_text[spans[i][0]:spans[i][1]]) + 1
+
+    chosen = set(anchors)
+    used = sum(cost(i) for i in chosen)
+    for i in sorted(scores, key=lambda i: -scores[i]):
+        if i in chosen:
+            continue
+        if used + cost(i) <= token_budget:
+            chosen.add(i)
+            used += cost(i)
+
+    parts = []
+    previous = None
+    for i in sorted(chosen):
+        if (previous is None and i > 0) or (previous is not None and i != previous + 1):
+            parts.append(GAP_MARKER)
+        parts.append(full_text[spans[i][0]:spans[i][1]].strip())
+        previous = i
+    if previous != len(spans) - 1:
+        parts.append(GAP_MARKER)
+    return '\n\n'.join(parts)
@@ -0,0 +1,161 @@
+from datetime import date
+import numpy as np
+from models import Debt, Goal
+from services.amortization import add_months, amortize, debt_arrays, first_payment_month
+from services.budget_engine import EMAIL_CHUNK_SIZE
+from services.goal_simulation import months_until
+from services.rollups import user_monthly_nets
+
+# Complete months of history averaged into each user's surplus
+SURPLUS_MONTHS = 6
+DEFAULT_HORIZON = 60
+MAX_HORIZON = 600
+
+
+def user_surpluses(user_emails=None, months=SURPLUS_MONTHS, today=None):
+    """Average monthly net cash flow per user over the last complete months with transactions.
+
+    Reads the rollup in one grouped query per EMAIL_CHUNK_SIZE users (one
+    for everyone when user_emails is None); users without history are left out.
+    """
+    this_month = (today or date.today()).replace(day=1)
+    start = add_months(this_month, -months)
+    if user_emails is None:
+        chunks = [None]
+    else:
+        user_emails = sorted(set(user_emails))
+        chunks = [user_emails[i:i + EMAIL_CHUNK_SIZE] for i in range(0, len(user_emails), EMAIL_CHUNK_SIZE)]
+    surpluses = {}
+    for chunk in chunks:
+        for user_email, nets in user_monthly_nets(start, this_month, chunk).items():
+            surpluses[user_email] = sum(nets) / len(nets)
+    return surpluses
+
+
+def debt_minimums(debts, user_index, horizon):
+    """(n_users, horizon) minimum debt payments per month, until each debt is paid off."""
+    minimums = np.zeros((len(user_index), horizon))
+    debts = [d for d in debts if d.user_email in user_index]
+    if debts:
+        balance, rate, payment = debt_arrays(debts)
+        paid = amortize(balance, rate, payment, horizon)['payment']
+        np.add.at(minimums, [user_index[d.user_email] for d in debts], paid)
+    return minimums
+
+
+def allocate(needed, deadline, available):
+    """Greedy month-by-month split of each user's surplus across their goals.
+
+    `needed` and `deadline` are (n_users, n_goals) with each user's goals in
+    priority order (padding has needed 0); deadline is the months left until
+    the target date, or -1 without one. Each month every goal with a target
+    date first gets the even pace that meets it (all that is left once it is
+    due), in priority order; the rest of the month's surplus then fills goals
+    in priority order. Returns (contributions as (n_users, n_goals, months),
+    unallocated as (n_users, months)).
+    """
+    users, goals = needed.shape
+    months = available.shape[1]
+    contributions = np.zeros((users, goals, months))
+    unallocated = available.copy()
+    remaining = needed.copy()
+    has_deadline = deadline >= 0
+
+    for t in range(months):
+        if not (remaining > 0.005).any():
+            break
+        left = unallocated[:, t]
+        pace = np.where(has_deadline, remaining / np.maximum(deadline - t, 1), 0)
+        for wanted in (pace, None):
+            for g in range(goals):
+                give = np.minimum(remaining[:, g] if wanted is None else wanted[:, g], left)
+                give = np.minimum(give, remaining[:, g])
+                contributions[:, g, t] += give
+                remaining[:, g] -= give
+                left -= give
+        unallocated[:, t] = left
+    return contributions, unallocated
+
+
+def plan_goals(goals, debts=(), surpluses=None, horizon=DEFAULT_HORIZON, include_debts=False, today=None):
+    """Month-by-month goal contributions for every user with open goals, in one pass.
+
+    `surpluses` maps user_email to monthly surplus (as from user_surpluses);
+    users missing from it get 0. With include_debts the debts' minimum
+    payments come out of the surplus first.
+    """
+    start = first_payment_month(today)
+    surpluses = surpluses or {}
+    by_user = {}
+    for goal in sorted(goals, key=lambda g: (g.priority or 3, g.target_date or date.max, g.id)):
+        by_user.setdefault(goal.user_email, []).append(goal)
+    if not by_user:
+        return {'start': start.isoformat(), 'horizon': horizon, 'plans': {}}
+
+    emails = sorted(by_user)
+    user_index = {email: i for i, email in enumerate(emails)}
+    width = max(len(user_goals) for user_goals in by_user.values())
+    needed = np.zeros((len(emails), width))
+    deadline = np.full((len(emails), width), -1)
+    for i, email in enumerate(emails):
+        for g, goal in enumerate(by_user[email]):
+            needed[i, g] = max((goal.target_amount or 0) - (goal.current_amount or 0), 0)
+            if goal.target_date is not None:
+                deadline[i, g] = months_until(start, goal.target_date)
+
+    surplus = np.array([surpluses.get(email, 0.0) for email in emails])
+    minimums = debt_minimums(debts, user_index, horizon) if include_debts else np.zeros((len(emails), horizon))
+    available = np.maximum(surplus[:, None] - minimums, 0)
+    contributions, unallocated = allocate(needed, deadline, available)
+
+    funded = np.cumsum(contributions, axis=2) >= needed[:, :, None] - 0.005
+    completion = np.where(needed <= 0, 0, np.where(funded.any(axis=2), funded.argmax(axis=2) + 1, -1))
+
+    plans = {}
+    for i, email in enumerate(emails):
+        user_goals = by_user[email]
+        done = completion[i, :len(user_goals)]
+        # Cut the monthly lists once every goal is funded
+        length = int(done.max()) if (done >= 0).all() else horizon
+        goal_plans = []
+        for g, goal in enumerate(user_goals):
+            month = int(done[g])
+            completion_date = add_months(start, max(month - 1, 0)) if month >= 0 else None
+            goal_plans.append({
+                'id': goal.id,
+                'name': goal.name,
+                'priority': goal.priority,
+                'remaining': round(float(needed[i, g]), 2),
+                'target_date': goal.target_date.isoformat() if goal.target_date else None,
+                'months_to_complete': month if month >= 0 else None,
+                'completion_date': completion_date.isoformat() if completion_date else None,
+                'on_track': goal.target_date is None or (
+                    completion_date is not None and completion_date <= goal.target_date),
+                'contributions': np.round(contributions[i, g, :length], 2).tolist()
+            })
+        plans[email] = {
+            'monthly_surplus': round(float(surplus[i]), 2),
+            'debt_minimums': np.round(minimums[i, :length], 2).tolist() if include_debts else None,
+            'goals': goal_plans,
+            'unallocated': np.round(unallocated[i, :length], 2).tolist()
+        }
+    return {'start': start.isoformat(), 'horizon': horizon, 'plans': plans}
+
+
+def run_plan(user_emails=None, horizon=DEFAULT_HORIZON, include_debts=False, surpluses=None, today=None):
+    """Load open goals (and debts) for the users, or everyone, and plan them in one batch.
+
+    Pass `surpluses` to reuse ones computed earlier instead of reading the rollup.
+    """
+    goals = Goal.query.filter(Goal.is_achieved.isnot(True), Goal.user_email.isnot(None))
+    debts = Debt.query
+    if user_emails is not None:
+        goals = goals.filter(Goal.user_email.in_(user_emails))
+        debts = debts.filter(Debt.user_email.in_(user_emails))
+    goals = goals.all()
+    if surpluses is None:
+        surpluses = user_surpluses(
+            None if user_emails is None else {g.user_email for g in goals}, today=today
+        )
+    return plan_goals(goals, debts.order_by(Debt.id).all() if include_debts else (),
+                      surpluses, horizon, include_debts, today)
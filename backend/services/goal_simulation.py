@@ -0,0 +1,122 @@
+import time
+from datetime import date
+import numpy as np
+from models import Goal
+from services.amortization import add_months, first_payment_month
+from services.rollups import monthly_flows
+from services.whatif import goal_arrays
+
+DEFAULT_PATHS = 10_000
+MAX_PATHS = 100_000
+# Paths simulated per array pass; the wall time limit is checked between passes
+BATCH_PATHS = 2_000
+# Months of history the monthly net cash flow is sampled from
+HISTORY_MONTHS = 24
+DEFAULT_HORIZON = 120
+MAX_HORIZON = 600
+PERCENTILES = (10, 50, 90)
+
+
+def net_history(user_email=None, months=HISTORY_MONTHS, today=None):
+    """Net cash flow (income minus expenses) of each recent complete month with transactions."""
+    this_month = (today or date.today()).replace(day=1)
+    flows = monthly_flows(add_months(this_month, -months), this_month, user_email)
+    return np.array([income - expenses for income, expenses in flows.values()], dtype=float)
+
+
+def months_until(start, target_date):
+    """Months from `start` through the month containing target_date (0 if it is before start)."""
+    return max((target_date.year - start.year) * 12 + target_date.month - start.month + 1, 0)
+
+
+def simulate_completion(history, needed, paths, horizon, rng, time_limit=None):
+    """Sample monthly net cash flow and find when each path funds each goal.
+
+    Every path draws `horizon` months from `history` with replacement and
+    saves them up; the goals are funded one at a time in the given order, so
+    goal g completes once savings cover it and every goal before it. Money
+    drawn back out after a goal is reached does not undo it. Paths run in
+    batches of BATCH_PATHS and stop early once `time_limit` seconds have
+    passed. Returns a (paths_run, n_goals) array of completion months
+    (0 if already funded, -1 if not within the horizon).
+    """
+    deadline = time.perf_counter() + time_limit if time_limit else None
+    thresholds = np.cumsum(needed) - 0.005
+    results = []
+    done = 0
+    while done < paths:
+        if deadline and results and time.perf_counter() > deadline:
+            break
+        batch = min(BATCH_PATHS, paths - done)
+        draws = rng.choice(history, size=(batch, horizon))
+        funded = np.maximum.accumulate(np.maximum(np.cumsum(draws, axis=1), 0), axis=1)
+        reached = funded[:, None, :] >= thresholds[None, :, None]
+        months = np.where(reached.any(axis=2), reached.argmax(axis=2) + 1, -1)
+        results.append(np.where(needed[None, :] <= 0, 0, months))
+        done += batch
+    return np.concatenate(results) if results else np.zeros((0, len(needed)), dtype=int)
+
+
+def project_goals(goals, history, paths=DEFAULT_PATHS, horizon=DEFAULT_HORIZON, seed=None,
+                  time_limit=None, today=None):
+    """Monte Carlo odds of each goal meeting its target date, and percentile completion dates.
+
+    A `seed` makes the run reproducible (as long as it is not cut short by
+    `time_limit`).
+    """
+    if not len(history):
+        raise ValueError("No transaction history to sample monthly cash flow from")
+    start = first_payment_month(today)
+    goals, needed = goal_arrays(goals)
+    rng = np.random.default_rng(seed)
+    months = simulate_completion(history, needed, paths, horizon, rng, time_limit)
+    # Paths that never finish sort after every real month
+    sortable = np.where(months < 0, horizon + 1, months)
+
+    def month_date(month):
+        return add_months(start, max(int(month) - 1, 0)).isoformat() if month <= horizon else None
+
+    results = []
+    for j, goal in enumerate(goals):
+        completion = sortable[:, j]
+        on_time = None
+        if goal.target_date is not None:
+            on_time = round(float((completion <= months_until(start, goal.target_date)).mean()), 4)
+        results.append({
+            'id': goal.id,
+            'name': goal.name,
+            'priority': goal.priority,
+            'target_amount': goal.target_amount,
+            'remaining': round(float(needed[j]), 2),
+            'target_date': goal.target_date.isoformat() if goal.target_date else None,
+            'probability_on_time': on_time,
+            'probability_within_horizon': round(float((completion <= horizon).mean()), 4),
+            'completion_dates': {
+                f'p{p}': month_date(np.percentile(completion, p, method='higher')) for p in PERCENTILES
+            }
+        })
+
+    return {
+        'start': start.isoformat(),
+        'horizon': horizon,
+        'paths': len(months),
+        'requested_paths': paths,
+        'truncated': len(months) < paths,
+        'seed': seed,
+        'months_of_history': len(history),
+        'monthly_net': {
+            'mean': round(float(history.mean()), 2),
+            'std': round(float(history.std()), 2)
+        },
+        'goals': results
+    }
+
+
+def run_projection(user_email=None, paths=DEFAULT_PATHS, horizon=DEFAULT_HORIZON, seed=None,
+                   time_limit=None, today=None):
+    """Load a user's open goals and history and project them."""
+    goals = Goal.query.filter(Goal.is_achieved.isnot(True))
+    if user_email:
+        goals = goals.filter(Goal.user_email == user_email)
+    history = net_history(user_email, today=today)
+    return project_goals(goals.all(), history, paths, horizon, seed, time_limit, today)
@@ -0,0 +1,271 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from flask import Flask
+from extensions import db
+from models import MonthlyInsight, MonthlyCategoryTotal, User
+from services.rollups import monthly_totals, benchmark_ratios, month_version
+
+# Users per worker task when precomputing insights in a process pool
+INSIGHTS_CHUNK_SIZE = 200
+
+# Spending benchmarks (percentage of income)
+SPENDING_BENCHMARKS = {
+    'Housing': 30,
+    'Food': 15,
+    'Transportation': 15,
+    'Entertainment': 5,
+    'Utilities': 10,
+    'Education': 10,
+    'Other': 15
+}
+
+
+def get_financial_summary(user_email=None, year=None, month=None):
+    """Get enhanced financial summary with ratios and benchmarks"""
+    # Default to the current month and year
+    now = datetime.now()
+    current_month = month or now.month
+    current_year = year or now.year
+    
+    # Month totals per (is_income, category), read from the monthly rollup
+    totals = monthly_totals(current_year, current_month, user_email).all()
+    
+    # Calculate totals
+    total_income = sum(row.total for row in totals if row.is_income)
+    total_expenses = sum(row.total for row in totals if not row.is_income)
+    transaction_count = sum(row.count for row in totals)
+    
+    benchmarks = dict(SPENDING_BENCHMARKS)
+    
+    # Initialize category structure
+    categories = {
+        category: {
+            'total': 0,
+            'percentage_of_income': 0,
+            'benchmark': benchmarks[category],
+            'over_benchmark': False
+        } 
+        for category in benchmarks
+    }
+    
+    # Spending, share of income and benchmark comparison per category, in SQL
+    for row in benchmark_ratios(current_year, current_month, benchmarks, total_income, user_email):
+        categories[row.category].update(
+            total=row.total,
+            percentage_of_income=row.percentage_of_income,
+            over_benchmark=bool(row.over_benchmark)
+        )
+    
+    # Calculate savings
+    savings = total_income - total_expenses
+    savings_rate = round((savings / total_income * 100), 1) if total_income > 0 else 0
+    
+    # Identify top 3 expenses
+    sorted_categories = sorted(
+        categories.items(),
+        key=lambda x: x[1]['total'],
+        reverse=True
+    )
+    top_expenses = [
+        {
+            'name': name,
+            'amount': data['total'],
+            'percentage': data['percentage_of_income']
+        } 
+        for name, data in sorted_categories[:3]
+    ]
+    
+    return {
+        'month': current_month,
+        'year': current_year,
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'savings': savings,
+        'savings_rate': savings_rate,
+        'categories': categories,
+        'benchmarks': benchmarks,
+        'top_expenses': top_expenses,
+        'transaction_count': transaction_count,
+        'analysis_ready': total_income > 0  # Flag for whether analysis is possible
+    }
+
+
+def build_insights(financial_data):
+    """Good and bad habit messages for a financial summary."""
+    # Mock insights derived from the summary instead of an API call
+    return {
+        "good_habits": [
+            f"You're saving {financial_data['savings_rate']:.1f}% of your income, which is above the recommended 20%",
+            f"Your {max(financial_data['categories'].items(), key=lambda x: x[1]['total'])[0]} spending is well-managed at {max(financial_data['categories'].items(), key=lambda x: x[1]['percentage_of_income'])[1]['percentage_of_income']:.1f}% of your income"
+        ],
+        "bad_habits": [
+            f"Your {max(financial_data['categories'].items(), key=lambda x: x[1]['total'])[0]} spending is high at {max(financial_data['categories'].items(), key=lambda x: x[1]['percentage_of_income'])[1]['percentage_of_income']:.1f}% of your income, consider reviewing this category",
+            f"Your savings rate of {financial_data['savings_rate']:.1f}% is below the recommended 20%"
+        ]
+    }
+
+
+def compute_insights(year, month, user_email=None):
+    """(version, insights) for one user's month, or all users when user_email is empty."""
+    version = month_version(year, month, user_email or None)
+    return version, build_insights(get_financial_summary(user_email or None, year, month))
+
+
+def store_insights(year, month, results):
+    """Upsert [(user_email, version, insights)] into monthly_insights and commit."""
+    table = MonthlyInsight.__table__
+    emails = [user_email for user_email, _, _ in results]
+    for i in range(0, len(emails), INSIGHTS_CHUNK_SIZE):
+        db.session.execute(table.delete().where(
+            table.c.year == year,
+            table.c.month == month,
+            table.c.user_email.in_(emails[i:i + INSIGHTS_CHUNK_SIZE])
+        ))
+    if results:
+        now = datetime.utcnow()
+        db.session.execute(table.insert(), [
+            {'user_email': user_email, 'year': year, 'month': month,
+             'version': version, 'insights': insights, 'computed_at': now}
+            for user_email, version, insights in results
+        ])
+    db.session.commit()
+
+
+def stored_insights(year, month, user_email=None):
+    """The precomputed MonthlyInsight row for a user's month, current or not, else None."""
+    return db.session.get(MonthlyInsight, (user_email or '', year, month))
+
+
+def all_user_emails(year, month):
+    """Every user plus anyone with transactions that month, and '' for the all-users view."""
+    emails = {email for (email,) in db.session.query(User.email)}
+    emails.update(email for (email,) in db.session.query(MonthlyCategoryTotal.user_email).filter(
+        MonthlyCategoryTotal.year == year,
+        MonthlyCategoryTotal.month == month
+    ).distinct())
+    emails.add('')
+    return sorted(emails)
+
+
+# Per-process app used by pool workers to reach the database
+worker_app = None
+
+
+def init_worker(database_uri):
+    global worker_app
+    worker_app = Flask(__name__)
+    worker_app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    worker_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(worker_app)
+
+
+def compute_chunk(year, month, user_emails):
+    """Pool task: insights for a chunk of users. Workers only read; the parent writes."""
+    with worker_app.app_context():
+        results = [(user_email, *compute_insights(year, month, user_email)) for user_email in user_emails]
+        db.session.remove()
+    return results
+
+
+def precompute_insights(year, month, user_emails=None, workers=None):
+    """Compute and store insights for a month, fanning large batches out to a process pool.
+
+    Defaults to every user. Must run inside an app context. Returns the
+    number of rows written.
+    """
+    user_emails = sorted(set(user_emails)) if user_emails is not None else all_user_emails(year, month)
+    chunks = [user_emails[i:i + INSIGHTS_CHUNK_SIZE] for i in range(0, len(user_emails), INSIGHTS_CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    database_uri = db.engine.url.render_as_string(hide_password=False)
+
+    if workers == 1 or len(chunks) <= 1 or db.engine.url.database in (None, '', ':memory:'):
+        # Not worth a pool (or the database is private to this process)
+        results = [(user_email, *compute_insights(year, month, user_email)) for user_email in user_emails]
+    else:
+        results = []
+        # Spawned rather than forked: this can run on a scheduler thread
+        with ProcessPoolExecutor(min(workers, len(chunks)), mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(database_uri,)) as pool:
+            for chunk_results in pool.map(compute_chunk, [year] * len(chunks), [month] * len(chunks), chunks):
+                results.extend(chunk_results)
+
+    store_insights(year, month, results)
+    return len(results)
+
+
+def months_to_refresh(today=None):
+    """The month that just ended and the one that just started."""
+    today = today or date.today()
+    previous = (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+    return [previous, (today.year, today.month)]
+
+
+def refresh_insights(app, months=None, user_emails=None, workers=None):
+    """Scheduler job: precompute insights for the given (year, month) pairs.
+
+    Returns [(year, month, rows written)].
+    """
+    done = []
+    with app.app_context():
+        for year, month in months or months_to_refresh():
+            count = precompute_insights(year, month, user_emails, workers or app.config.get('INSIGHTS_WORKERS'))
+            app.logger.info(f"Precomputed {count} insights for {year}-{month:02d}")
+            done.append((year, month, count))
+    return done
+
+
+def run_scheduler(app):
+    """Run the month-end insights job until interrupted (`flask run-insights-scheduler`).
+
+    Start it in exactly one process per database, not in the web workers.
+    """
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    scheduler = BlockingScheduler()
+    scheduler.add_job(
+        refresh_insights, 'cron', args=[app], day=1, hour=0, minute=5,
+        id='insights-month-end', replace_existing=True, misfire_grace_time=6 * 60 * 60
+    )
+    scheduler.start()
+
+
+# One background thread per process refreshes stale insights, one month at a time
+refresh_executor = None
+refresh_lock = threading.Lock()
+# (year, month, user_emails) waiting in refresh_executor
+pending_refreshes = set()
+
+
+def run_refresh(app, key):
+    year, month, user_emails = key
+    with refresh_lock:
+        pending_refreshes.discard(key)
+    try:
+        refresh_insights(app, [(year, month)], sorted(user_emails), workers=1)
+    except Exception as e:
+        app.logger.error(f"Insights refresh for {year}-{month:02d} failed: {str(e)}")
+
+
+def schedule_insights_refresh(app, months_by_user):
+    """Queue a background refresh of stale insights, given {user_email: {(year, month)}}.
+
+    The all-users view ('') of each month is refreshed too. Refreshes run
+    on this process's refresh thread without a process pool; one already
+    waiting in the queue is not added twice.
+    """
+    global refresh_executor
+    months = {}
+    for user_email, user_months in months_by_user.items():
+        for year_month in user_months:
+            months.setdefault(year_month, set()).update((user_email or '', ''))
+    for (year, month), user_emails in months.items():
+        key = (year, month, frozenset(user_emails))
+        with refresh_lock:
+            if key in pending_refreshes:
+                continue
+            pending_refreshes.add(key)
+            if refresh_executor is None:
+                refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='insights-refresh')
+        refresh_executor.submit(run_refresh, app, key)
@@ -0,0 +1,384 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIConnectionError, APIStatusError
+
+
+class GatewayBusy(Exception):
+    """Raised when the gateway's queue is full and a call is rejected outright."""
+
+
+class GatewayTimeout(TimeoutError):
+    """Raised when a call waits too long for a slot or for the upstream reply."""
+
+
+class CircuitOpen(GatewayBusy):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+# Marks the end of a streamed completion on the hand-off queue
+STREAM_END = object()
+
+# Upstream statuses worth retrying: timeouts, conflicts, rate limits and server errors.
+# A call that exceeds our own timeout is not retried; it already used its time.
+RETRYABLE_STATUSES = {408, 409, 429}
+
+
+class CallStats:
+    """Timings and usage of one gateway call, filled in while it runs."""
+
+    def __init__(self, model=None, route=None):
+        self.model = model
+        self.route = route
+        self.queue_wait = 0.0
+        self.upstream_latency = 0.0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.outcome = 'ok'
+
+    def add_usage(self, usage):
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def fail(self, error):
+        if isinstance(error, CircuitOpen):
+            self.outcome = 'circuit_open'
+        elif isinstance(error, GatewayBusy):
+            self.outcome = 'busy'
+        elif isinstance(error, GatewayTimeout):
+            self.outcome = 'timeout'
+        else:
+            self.outcome = 'error'
+
+
+# Callables run with the CallStats of every finished call, on the calling thread
+call_hooks = []
+
+
+def add_call_hook(hook):
+    if hook not in call_hooks:
+        call_hooks.append(hook)
+
+
+def run_call_hooks(stats):
+    for hook in call_hooks:
+        hook(stats)
+
+
+def is_retryable(error):
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES or error.status_code >= 500
+    return False
+
+
+def retry_after(error):
+    """Seconds the upstream asked us to wait before retrying, if it said."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'retry-after' in headers:
+            value = headers['retry-after']
+            try:
+                return float(value)
+            except ValueError:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused for `reset_timeout` seconds. Then a single trial call is let
+    through: success closes the circuit, failure opens it again, and if it
+    never reports back another trial follows after `reset_timeout`. Answers
+    that are not failures of the upstream (non-retryable 4xx) are neither.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go upstream now."""
+        with self.lock:
+            if self.state == 'closed':
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0:
+                self.state = 'half_open'
+                self.opened_at = time.monotonic()
+                return
+            raise CircuitOpen(f"LLM upstream is degraded, try again in {max(remaining, 1):.0f}s")
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def record_inconclusive(self):
+        """An answer that says nothing about upstream health, like a 4xx for a bad request.
+
+        Leaves the state and failure count alone; a trial call that got one
+        lets the next call be the trial instead.
+        """
+        with self.lock:
+            if self.state == 'half_open':
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+
+class LLMGateway:
+    """Runs OpenAI chat completions on a private asyncio event loop.
+
+    Calls are issued with AsyncOpenAI from one background thread instead of
+    each request thread opening its own blocking connection. At most
+    `max_concurrency` calls are in flight upstream, at most `max_queue` more
+    wait for a slot, and anything beyond that is rejected immediately with
+    GatewayBusy, so a burst of slow completions cannot pile up on every
+    worker thread and starve the rest of the API.
+
+    Connections come from one keep-alive pool sized to `max_concurrency`.
+    Transient upstream errors are retried up to `max_retries` times with
+    jittered exponential backoff (or the upstream's Retry-After), and a
+    circuit breaker refuses calls outright while the upstream keeps failing.
+    """
+
+    def __init__(self, api_key=None, max_concurrency=8, max_queue=32,
+                 timeout=30.0, queue_timeout=10.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, breaker=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=60
+            ),
+            timeout=httpx.Timeout(timeout, connect=5.0)
+        )
+        # Retries are done here, outside the concurrency slot, not by the SDK
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='llm-gateway', daemon=True)
+        self.thread.start()
+
+    def backoff(self, attempt, error):
+        """Delay before retry number `attempt` (0-based), or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            if requested > self.backoff_max * 4:
+                return None
+            delay = max(delay, requested)
+        return delay
+
+    async def acquire(self, stats):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise GatewayTimeout(f"No LLM slot free after {self.queue_timeout}s")
+        finally:
+            stats.queue_wait += time.perf_counter() - started
+
+    async def attempt(self, kwargs, timeout, stats, keep_slot=False):
+        """One upstream call, holding a concurrency slot while it runs.
+
+        With `keep_slot` the slot stays taken after a successful call and the
+        caller releases it (used to hold it for the life of a stream).
+        """
+        self.breaker.check()
+        await self.acquire(stats)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), timeout)
+        except asyncio.TimeoutError:
+            self.semaphore.release()
+            self.breaker.record_failure()
+            raise GatewayTimeout(f"LLM call exceeded {timeout}s")
+        except BaseException:
+            self.semaphore.release()
+            raise
+        finally:
+            stats.upstream_latency += time.perf_counter() - started
+        if not keep_slot:
+            self.semaphore.release()
+        return response
+
+    async def call_with_retries(self, kwargs, timeout, stats, keep_slot=False):
+        """attempt() with backoff between retries; no slot is held while waiting."""
+        attempt = 0
+        while True:
+            try:
+                response = await self.attempt(kwargs, timeout, stats, keep_slot)
+            except (CircuitOpen, GatewayTimeout):
+                raise
+            except Exception as e:
+                if is_retryable(e):
+                    self.breaker.record_failure()
+                elif isinstance(e, APIStatusError):
+                    # The upstream answered, it just refused this request
+                    self.breaker.record_inconclusive()
+                delay = self.backoff(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                stats.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+
+    async def run(self, kwargs, timeout, stats):
+        response = await self.call_with_retries(kwargs, timeout, stats)
+        stats.add_usage(getattr(response, 'usage', None))
+        return response
+
+    async def run_stream(self, kwargs, chunks, stats):
+        try:
+            # Only opening the stream is retried; chunks already relayed cannot be replayed
+            stream = await self.call_with_retries(dict(kwargs, stream=True), self.timeout, stats, keep_slot=True)
+            started = time.perf_counter()
+            try:
+                async for chunk in stream:
+                    stats.add_usage(getattr(chunk, 'usage', None))
+                    chunks.put(chunk)
+            finally:
+                stats.upstream_latency += time.perf_counter() - started
+                self.semaphore.release()
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(STREAM_END)
+
+    def admit(self):
+        with self.lock:
+            if self.pending >= self.max_concurrency + self.max_queue:
+                raise GatewayBusy("Too many LLM requests in flight, try again shortly")
+            self.pending += 1
+
+    def submit(self, timeout=None, stats=None, **kwargs):
+        """Queue a chat completion and return a concurrent.futures.Future for it."""
+        self.admit()
+        stats = stats or CallStats(kwargs.get('model'))
+        future = asyncio.run_coroutine_threadsafe(self.run(kwargs, timeout or self.timeout, stats), self.loop)
+        future.add_done_callback(self.call_done)
+        return future
+
+    def stream_chat_completion(self, timeout=None, route=None, **kwargs):
+        """Start a streamed chat completion and return a generator of its chunks.
+
+        Admission happens before this returns, so GatewayBusy can still be
+        turned into an error response. `timeout` bounds the wait for each
+        chunk; closing the generator early cancels the upstream call.
+        """
+        stats = CallStats(kwargs.get('model'), route)
+        try:
+            self.admit()
+        except GatewayBusy as e:
+            stats.fail(e)
+            run_call_hooks(stats)
+            raise
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self.run_stream(kwargs, chunks, stats), self.loop)
+        future.add_done_callback(self.call_done)
+        return self.iter_stream(chunks, future, timeout or self.timeout, stats)
+
+    def iter_stream(self, chunks, future, timeout, stats):
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise GatewayTimeout(f"No LLM output for {timeout}s")
+                if item is STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        except GeneratorExit:
+            stats.outcome = 'cancelled'
+            raise
+        except BaseException as e:
+            stats.fail(e)
+            raise
+        finally:
+            future.cancel()
+            run_call_hooks(stats)
+
+    def call_done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def chat_completion(self, timeout=None, route=None, **kwargs):
+        """Blocking convenience wrapper around submit() for sync Flask views.
+
+        Call hooks run on the calling thread once the call has finished.
+        """
+        stats = CallStats(kwargs.get('model'), route)
+        try:
+            return self.submit(timeout, stats, **kwargs).result()
+        except BaseException as e:
+            stats.fail(e)
+            raise
+        finally:
+            run_call_hooks(stats)
+
+
+gateway = None
+gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway, created on first use (after any worker fork)."""
+    global gateway
+    with gateway_lock:
+        if gateway is None:
+            gateway = LLMGateway(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+                max_queue=int(os.getenv('LLM_MAX_QUEUE', 32)),
+                timeout=float(os.getenv('LLM_TIMEOUT', 30)),
+                queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', 10)),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', 5)),
+                    reset_timeout=float(os.getenv('LLM_BREAKER_RESET', 30))
+                )
+            )
+        return gateway
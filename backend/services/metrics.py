@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from flask import Response, g, has_request_context, request
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# USD per million (prompt, completion) tokens, for the cost estimate
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+
+
+class Registry:
+    """In-process counters and histograms, rendered in the Prometheus text format.
+
+    Each worker process keeps its own numbers; scrape every worker (or run
+    one) to get the full picture.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self.metrics[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.metrics[name] = ('histogram', help_text, buckets)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self.metrics[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(buckets), 0.0, 0))
+            counts = [c + (value <= bound) for c, bound in zip(counts, buckets)]
+            self.values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        with self.lock:
+            values = dict(self.values)
+        lines = []
+        for name, (kind, help_text, buckets) in self.metrics.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(values.items()):
+                if metric != name:
+                    continue
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {bucket_count}')
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+registry = Registry()
+registry.counter('llm_requests_total', 'LLM calls by route, model and outcome')
+registry.counter('llm_retries_total', 'Upstream retries after transient LLM errors')
+registry.counter('llm_tokens_total', 'Tokens used by LLM calls, by kind (prompt or completion)')
+registry.counter('llm_cost_usd_total', 'Estimated LLM spend in USD')
+registry.counter('llm_cache_requests_total', 'Lookups in the caches in front of the LLM, by result')
+registry.histogram('llm_queue_wait_seconds', 'Time LLM calls waited for a concurrency slot')
+registry.histogram('llm_upstream_latency_seconds', 'Time spent in upstream LLM calls')
+
+
+def current_route():
+    return (request.endpoint or request.path) if has_request_context() else 'background'
+
+
+def request_summary():
+    """The current request's LLM summary, created on first use (None outside requests)."""
+    if not has_request_context():
+        return None
+    if 'llm_summary' not in g:
+        g.llm_summary = {
+            'llm_calls': 0, 'queue_wait': 0.0, 'upstream_latency': 0.0, 'retries': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0,
+            'cache_hits': 0, 'cache_misses': 0, 'outcomes': []
+        }
+    return g.llm_summary
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def record_llm_call(stats):
+    """Gateway hook: fold one finished call (a CallStats) into the registry and request summary."""
+    route = stats.route or current_route()
+    model = stats.model or 'unknown'
+    cost = call_cost(model, stats.prompt_tokens, stats.completion_tokens)
+    registry.inc('llm_requests_total', route=route, model=model, outcome=stats.outcome)
+    registry.observe('llm_queue_wait_seconds', stats.queue_wait, route=route)
+    if stats.upstream_latency:
+        registry.observe('llm_upstream_latency_seconds', stats.upstream_latency, route=route, model=model)
+    if stats.retries:
+        registry.inc('llm_retries_total', stats.retries, route=route)
+    if stats.prompt_tokens:
+        registry.inc('llm_tokens_total', stats.prompt_tokens, route=route, model=model, kind='prompt')
+    if stats.completion_tokens:
+        registry.inc('llm_tokens_total', stats.completion_tokens, route=route, model=model, kind='completion')
+    if cost:
+        registry.inc('llm_cost_usd_total', cost, route=route, model=model)
+
+    summary = request_summary()
+    if summary is not None:
+        summary['llm_calls'] += 1
+        summary['queue_wait'] += stats.queue_wait
+        summary['upstream_latency'] += stats.upstream_latency
+        summary['retries'] += stats.retries
+        summary['prompt_tokens'] += stats.prompt_tokens
+        summary['completion_tokens'] += stats.completion_tokens
+        summary['cost_usd'] += cost
+        summary['outcomes'].append(stats.outcome)
+
+
+def record_cache(cache, hit):
+    """Count a lookup in one of the caches that stand in front of LLM calls."""
+    registry.inc('llm_cache_requests_total', route=current_route(), cache=cache, result='hit' if hit else 'miss')
+    summary = request_summary()
+    if summary is not None:
+        summary['cache_hits' if hit else 'cache_misses'] += 1
+
+
+def init_app(app):
+    """Record gateway calls, log a per-request LLM summary and serve GET /metrics."""
+    from services.llm_gateway import add_call_hook
+    add_call_hook(record_llm_call)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_llm_summary(response):
+        summary = request_summary()
+        started = g.get('request_started', time.perf_counter())
+        entry = {
+            'event': 'llm_request_summary',
+            'method': request.method,
+            'path': request.path,
+            'route': current_route(),
+            'status': response.status_code
+        }
+        logger = app.logger
+
+        # Streamed replies finish after this hook, so log once the body is sent;
+        # the summary dict keeps collecting until then
+        def log_summary():
+            if not (summary['llm_calls'] or summary['cache_hits'] or summary['cache_misses']):
+                return
+            entry['duration'] = round(time.perf_counter() - started, 4)
+            entry.update((k, round(v, 8) if isinstance(v, float) else v) for k, v in summary.items())
+            logger.info(json.dumps(entry))
+
+        response.call_on_close(log_summary)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
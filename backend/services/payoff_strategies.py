@@ -0,0 +1,133 @@
+import numpy as np
+from services.amortization import (
+    MAX_MONTHS, PAID_OFF, add_months, amortize, debt_arrays, first_payment_month, payoff_months
+)
+
+STRATEGIES = ('avalanche', 'snowball', 'custom')
+
+# Most monthly budget levels evaluated in one request
+MAX_BUDGET_LEVELS = 1000
+
+
+def priority_order(strategy, ids, balance, rate, custom_order=None):
+    """Indices of the debts in the order extra money is sent to them.
+
+    avalanche: highest interest rate first (smaller balance breaks ties).
+    snowball: smallest balance first (higher rate breaks ties).
+    custom: the ids in custom_order first, then any others as listed.
+    """
+    if strategy == 'avalanche':
+        return np.lexsort((balance, -rate))
+    if strategy == 'snowball':
+        return np.lexsort((-rate, balance))
+    if strategy == 'custom':
+        position = {debt_id: i for i, debt_id in enumerate(custom_order or [])}
+        key = [position.get(debt_id, len(position) + i) for i, debt_id in enumerate(ids)]
+        return np.argsort(key, kind='stable')
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def pay_month(balance, rate, minimum, budget):
+    """One month of payments for rows of debts already in priority order.
+
+    Every debt accrues interest and gets its minimum payment; the rest of the
+    row's budget goes to the debts left to right, so payments freed by a
+    cleared debt roll into the next one. Returns (balance, interest, paid)
+    with interest and paid per debt.
+    """
+    interest = balance * rate
+    balance = balance + interest
+    paid = np.minimum(minimum, balance)
+    balance = balance - paid
+    extra = np.maximum(budget - paid.sum(axis=1), 0)
+    before = np.cumsum(balance, axis=1) - balance
+    extra_paid = np.clip(extra[:, None] - before, 0, balance)
+    balance = balance - extra_paid
+    balance[balance < PAID_OFF] = 0
+    return balance, interest, paid + extra_paid
+
+
+def simulate_budgets(balance, rate, minimum, budgets, orders, months=MAX_MONTHS):
+    """Simulate every (payment order, monthly budget) pair in one pass.
+
+    Rows are orders x budgets, each stepped month by month with pay_month.
+    Returns (months_to_freedom, total_interest) arrays
+    with one entry per row; months_to_freedom is -1 when the budget does not
+    cover the minimums or the debts outlive the horizon.
+    """
+    orders = np.asarray(orders)
+    budgets = np.asarray(budgets, dtype=float)
+    perm = np.repeat(orders, len(budgets), axis=0)
+    budget = np.tile(budgets, len(orders))
+
+    # Work in each row's priority order so the cascade is a cumulative sum
+    bal = np.asarray(balance, dtype=float)[perm]
+    rate = np.asarray(rate, dtype=float)[perm]
+    minimum = np.asarray(minimum, dtype=float)[perm]
+
+    feasible = budget >= minimum.sum(axis=1) - PAID_OFF
+    freedom = np.where(bal.sum(axis=1) <= 0, 0, -1)
+    total_interest = np.zeros(len(budget))
+
+    for month in range(1, months + 1):
+        if not (bal[feasible] > 0).any():
+            break
+        bal, interest, paid = pay_month(bal, rate, minimum, budget)
+        total_interest += interest.sum(axis=1)
+
+        cleared = (freedom < 0) & (bal.sum(axis=1) == 0)
+        freedom[cleared] = month
+
+    freedom[~feasible] = -1
+    return freedom, total_interest
+
+
+def compare_strategies(debts, budgets, strategies=STRATEGIES, custom_order=None,
+                       months=MAX_MONTHS, today=None):
+    """Months to debt freedom and interest saved per strategy, for each budget level.
+
+    Interest saved is measured against paying only the minimums.
+    """
+    start = first_payment_month(today)
+    ids = [d.id for d in debts]
+    balance, rate, minimum = debt_arrays(debts)
+
+    baseline = amortize(balance, rate, minimum, months)
+    baseline_payoff = payoff_months(balance, baseline)
+    baseline_interest = float(baseline['interest'].sum())
+    baseline_months = int(baseline_payoff.max()) if (baseline_payoff >= 0).all() and ids else None
+
+    orders = [priority_order(s, ids, balance, rate, custom_order) for s in strategies]
+    if ids:
+        freedom, interest = simulate_budgets(balance, rate, minimum, budgets, orders, months)
+    else:
+        freedom = np.zeros(len(strategies) * len(budgets), dtype=int)
+        interest = np.zeros(len(strategies) * len(budgets))
+    freedom = freedom.reshape(len(strategies), len(budgets))
+    interest = interest.reshape(len(strategies), len(budgets))
+
+    def payoff_date(month):
+        return add_months(start, int(month) - 1).isoformat() if month > 0 else None
+
+    results = {}
+    for i, strategy in enumerate(strategies):
+        results[strategy] = {
+            'order': [ids[j] for j in orders[i]],
+            'months_to_freedom': [int(m) if m >= 0 else None for m in freedom[i]],
+            'debt_free_date': [payoff_date(m) for m in freedom[i]],
+            'total_interest': [round(float(x), 2) if m >= 0 else None for x, m in zip(interest[i], freedom[i])],
+            'interest_saved': [round(baseline_interest - float(x), 2) if m >= 0 else None
+                               for x, m in zip(interest[i], freedom[i])]
+        }
+
+    return {
+        'start': start.isoformat(),
+        'budgets': [round(float(b), 2) for b in budgets],
+        'minimum_budget': round(float(minimum.sum()), 2),
+        'baseline': {
+            'months_to_freedom': baseline_months,
+            'debt_free_date': payoff_date(baseline_months) if baseline_months else None,
+            'total_interest': round(baseline_interest, 2)
+        },
+        'strategies': results
+    }
@@ -0,0 +1,124 @@
+import base64
+from datetime import date
+from sqlalchemy import or_
+from models import Transaction
+
+# Column and JSON conversion for each field the API exposes on a transaction
+TRANSACTION_FIELDS = {
+    'id': (Transaction.id, lambda v: v),
+    'name': (Transaction.name, lambda v: v),
+    'amount': (Transaction.amount, float),
+    'is_income': (Transaction.is_income, bool),
+    'category': (Transaction.category, lambda v: v or 'other'),
+    'auto_categorized': (Transaction.auto_categorized, bool),
+    'date': (Transaction.date, lambda v: v.strftime('%Y-%m-%d') if v else None),
+    'payment_method': (Transaction.payment_method, lambda v: v),
+    'recurring': (Transaction.recurring, bool),
+    'recurrence': (Transaction.recurrence, lambda v: v),
+    'next_expected_date': (Transaction.next_expected_date, lambda v: v.strftime('%Y-%m-%d') if v else None),
+}
+
+
+# Strings accepted as booleans in JSON bodies and query arguments
+BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def parse_bool(value, default=False):
+    """A JSON boolean, or 'true'/'false'/'1'/'0' in any case; `default` when missing.
+
+    Raises ValueError for anything else, so "false" is never read as truthy.
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in BOOLEAN_STRINGS:
+        return BOOLEAN_STRINGS[value.strip().lower()]
+    raise ValueError(f"Invalid boolean: {value!r}")
+
+
+def month_range(year, month):
+    """Return the [start, end) dates covering a calendar month."""
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1)
+    else:
+        end_date = date(year, month + 1, 1)
+    return start_date, end_date
+
+
+def transactions_between(start_date, end_date, user_email=None):
+    """Transactions in [start_date, end_date), optionally scoped to one user.
+
+    Kept as a plain range on `date` so SQLite can seek the
+    (user_email, date) / (date) indexes instead of scanning the table.
+    """
+    query = Transaction.query.filter(
+        Transaction.date >= start_date,
+        Transaction.date < end_date
+    )
+    if user_email:
+        query = query.filter(Transaction.user_email == user_email)
+    return query
+
+
+def project(query, fields):
+    """Select only `fields` (plus id and date, needed for ordering) from a Transaction query."""
+    columns = {name: TRANSACTION_FIELDS[name][0] for name in ('id', 'date', *fields)}
+    return query.with_entities(*columns.values())
+
+
+def serialize_row(row, fields):
+    """Convert a projected row into the JSON dict returned by the API."""
+    return {name: TRANSACTION_FIELDS[name][1](getattr(row, name)) for name in fields}
+
+
+def encode_cursor(cursor_date, cursor_id):
+    """Opaque page token for the row at (cursor_date, cursor_id)."""
+    raw = f"{cursor_date.isoformat() if cursor_date else ''}|{cursor_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        cursor_date, cursor_id = raw.split('|')
+        return (date.fromisoformat(cursor_date) if cursor_date else None), int(cursor_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+def dated_page_query(query, cursor=None):
+    """Dated rows of `query` after `cursor`, newest first, as an index seek on (date, id)."""
+    query = query.filter(Transaction.date.isnot(None))
+    if cursor is not None:
+        cursor_date, cursor_id = cursor
+        query = query.filter(
+            Transaction.date <= cursor_date,
+            or_(Transaction.date < cursor_date, Transaction.id < cursor_id)
+        )
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+
+def keyset_page(query, cursor, limit):
+    """One page of `query` in newest-first (date, id) order, starting after `cursor`.
+
+    Dated rows are paged with a (date, id) seek that stays on the date
+    indexes; undated rows sort last and are paged by id alone. Returns the
+    rows and the cursor for the next page (None on the last page).
+    """
+    rows = []
+    if cursor is None or cursor[0] is not None:
+        rows = dated_page_query(query, cursor).limit(limit + 1).all()
+    if len(rows) <= limit:
+        undated = query.filter(Transaction.date.is_(None))
+        if cursor is not None and cursor[0] is None:
+            undated = undated.filter(Transaction.id < cursor[1])
+        rows += undated.order_by(Transaction.id.desc()).limit(limit + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,176 @@
+import calendar
+import re
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import func, or_, update
+from extensions import db
+from models import Transaction
+
+# (typical gap in days, allowed deviation) of each recurrence
+PERIODS = {
+    'weekly': (7, 1),
+    'biweekly': (14, 2),
+    'monthly': (30.44, 4),
+    'yearly': (365.25, 10),
+}
+MIN_OCCURRENCES = 3
+# Share of gaps that must match the period (allows the odd skipped or late charge)
+MIN_MATCHING_GAPS = 0.75
+# Largest step between neighbouring sorted amounts of one sub-series, as a ratio,
+# when a merchant's rows are split by amount (wide enough for a price rise)
+AMOUNT_GAP = 0.25
+# A series with no charge for this many periods has lapsed and gets no next date
+LAPSED_PERIODS = 2
+# Merchant words matched per query; SQLite rejects expressions nested more than 1000 deep
+MERCHANT_WORDS_PER_QUERY = 200
+
+# Whitespace and punctuation between the words of a transaction name
+WORD_SEPARATORS = re.compile(r'[\W_]+')
+NOT_LETTERS = re.compile(r'[^a-z]+')
+# Words that card processors add around merchant names
+NOISE_WORDS = {'pos', 'debit', 'credit', 'card', 'purchase', 'ach', 'online', 'www', 'com', 'inc', 'llc', 'co'}
+
+
+def merchant_tokens(name):
+    """Lowercase words of a transaction name, without processor noise.
+
+    Words containing a digit (store numbers, reference codes) are dropped
+    whole rather than left as stray letters.
+    """
+    words = (NOT_LETTERS.sub('', word) for word in WORD_SEPARATORS.split((name or '').lower())
+             if not any(c.isdigit() for c in word))
+    return [w for w in words if w and w not in NOISE_WORDS]
+
+
+def merchant_key(name):
+    """Normalized merchant name: the first three words of merchant_tokens."""
+    return ' '.join(merchant_tokens(name)[:3])
+
+
+def amount_clusters(rows):
+    """Split rows into runs of similar amounts.
+
+    Rows are sorted by amount and a new run starts wherever the next amount
+    is more than AMOUNT_GAP above the one before.
+    """
+    clusters = []
+    last = None
+    for row in sorted(rows, key=lambda row: abs(row.amount)):
+        amount = abs(row.amount)
+        if last is None or amount > last * (1 + AMOUNT_GAP) + 0.01:
+            clusters.append([])
+        clusters[-1].append(row)
+        last = amount
+    return clusters
+
+
+def find_series(rows):
+    """Group rows into candidate series and detect each one's period.
+
+    Rows are grouped by (merchant, direction) first. A group is split into
+    its amount_clusters only when some cluster recurs on its own (two
+    subscriptions with one merchant, or a subscription among one-off
+    purchases); otherwise it stays one series, so a price rise does not
+    break it up. Returns [(rows, period or None)].
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault((merchant_key(row.name), bool(row.is_income)), []).append(row)
+
+    series = []
+    for key in sorted(groups):
+        members = groups[key]
+        clusters = amount_clusters(members)
+        periods = [detect_period([row.date for row in cluster]) for cluster in clusters]
+        if len(clusters) > 1 and any(periods):
+            series.extend(zip(clusters, periods))
+        else:
+            series.append((members, detect_period([row.date for row in members])))
+    return series
+
+
+def detect_period(dates):
+    """Name of the recurrence the dates follow, or None."""
+    days = np.unique(np.array([d.toordinal() for d in dates]))
+    if len(days) < MIN_OCCURRENCES:
+        return None
+    gaps = np.diff(days)
+    median = np.median(gaps)
+    for period, (length, tolerance) in PERIODS.items():
+        if abs(median - length) <= tolerance:
+            matching = np.abs(gaps - length) <= tolerance
+            return period if matching.mean() >= MIN_MATCHING_GAPS else None
+    return None
+
+
+def next_occurrence(last, period):
+    if period == 'weekly':
+        return last + timedelta(days=7)
+    if period == 'biweekly':
+        return last + timedelta(days=14)
+    months = 1 if period == 'monthly' else 12
+    month = last.month - 1 + months
+    year, month = last.year + month // 12, month % 12 + 1
+    return date(year, month, min(last.day, calendar.monthrange(year, month)[1]))
+
+
+def refresh_recurring(user_email, merchants=None, today=None):
+    """Detect recurring series in a user's history and write back recurring/recurrence/next_expected_date.
+
+    Loads the user's history (only the columns needed). When `merchants`
+    (merchant_key values) is given, just those series are re-evaluated, so
+    it can run after each insert: only rows whose name contains one of the
+    merchants' first words are read, MERCHANT_WORDS_PER_QUERY words per
+    query. Every row in a detected series is marked with its recurrence and
+    the predicted date of the next charge (None once the series has lapsed);
+    other rows are cleared. Only changed rows are updated. Returns the
+    number of rows updated.
+    """
+    today = today or date.today()
+    query = db.session.query(
+        Transaction.id, Transaction.name, Transaction.amount, Transaction.is_income, Transaction.date,
+        Transaction.recurring, Transaction.recurrence, Transaction.next_expected_date
+    ).filter(
+        Transaction.user_email == user_email,
+        Transaction.date.isnot(None)
+    )
+    if merchants is not None and '' not in merchants:
+        if not merchants:
+            return 0
+        words = sorted({merchant.split()[0] for merchant in merchants})
+        rows = {}
+        for start in range(0, len(words), MERCHANT_WORDS_PER_QUERY):
+            batch = words[start:start + MERCHANT_WORDS_PER_QUERY]
+            for row in query.filter(or_(*(func.lower(Transaction.name).contains(word) for word in batch))):
+                rows[row.id] = row
+        rows = list(rows.values())
+    else:
+        rows = query.all()
+    if merchants is not None:
+        rows = [row for row in rows if merchant_key(row.name) in merchants]
+
+    changes = []
+    for members, period in find_series(rows):
+        members.sort(key=lambda row: row.date)
+        next_date = None
+        if period:
+            next_date = next_occurrence(members[-1].date, period)
+            if (today - members[-1].date).days > LAPSED_PERIODS * PERIODS[period][0]:
+                next_date = None
+        for row in members:
+            values = (period is not None, period, next_date)
+            if (bool(row.recurring), row.recurrence, row.next_expected_date) != values:
+                changes.append({'id': row.id, 'recurring': values[0], 'recurrence': period,
+                                'next_expected_date': next_date})
+
+    if changes:
+        db.session.execute(update(Transaction), changes)
+    db.session.commit()
+    return len(changes)
+
+
+def refresh_all_recurring(today=None):
+    """Run refresh_recurring over every user's full history. Returns {user_email: rows updated}."""
+    emails = [email for (email,) in db.session.query(Transaction.user_email).filter(
+        Transaction.user_email.isnot(None)).distinct()]
+    return {email: refresh_recurring(email, today=today) for email in emails}
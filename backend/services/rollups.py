@@ -0,0 +1,179 @@
+from sqlalchemy import case, extract, func, insert, literal, tuple_
+from extensions import db
+from models import MonthlyCategoryTotal, MonthVersion, Transaction
+
+
+def rebuild_monthly_totals():
+    """Recompute monthly_category_totals from the transactions table.
+
+    Use after backfills or any write that bypassed the ORM. Every month's
+    MonthVersion is bumped, since any of them may have changed. Returns the
+    number of rollup rows written.
+    """
+    year = extract('year', Transaction.date)
+    month = extract('month', Transaction.date)
+    user_email = func.coalesce(Transaction.user_email, '')
+    category = func.coalesce(Transaction.category, 'other')
+    is_income = func.coalesce(Transaction.is_income, False)
+    totals = db.session.query(
+        user_email, year, month, category, is_income,
+        func.sum(Transaction.amount), func.count(Transaction.id)
+    ).filter(
+        Transaction.date.isnot(None)
+    ).group_by(user_email, year, month, category, is_income)
+
+    table = MonthlyCategoryTotal.__table__
+    db.session.execute(table.delete())
+    result = db.session.execute(insert(table).from_select(
+        ['user_email', 'year', 'month', 'category', 'is_income', 'total', 'count'],
+        totals.statement
+    ))
+
+    versions = MonthVersion.__table__
+    db.session.execute(versions.update().values(version=versions.c.version + 1))
+    existing = set(db.session.query(MonthVersion.user_email, MonthVersion.year, MonthVersion.month))
+    months = set(db.session.query(
+        MonthlyCategoryTotal.user_email, MonthlyCategoryTotal.year, MonthlyCategoryTotal.month
+    ).distinct())
+    months |= {('', year, month) for _, year, month in months}
+    missing = [{'user_email': user_email, 'year': year, 'month': month, 'version': 1}
+               for user_email, year, month in months - existing]
+    if missing:
+        db.session.execute(insert(versions), missing)
+    db.session.commit()
+    return result.rowcount
+
+
+def monthly_totals(year, month, user_email=None):
+    """Total amount and row count per (is_income, category) for one month, read from the rollup."""
+    query = db.session.query(
+        MonthlyCategoryTotal.is_income,
+        MonthlyCategoryTotal.category,
+        func.sum(MonthlyCategoryTotal.total).label('total'),
+        func.sum(MonthlyCategoryTotal.count).label('count')
+    ).filter(
+        MonthlyCategoryTotal.year == year,
+        MonthlyCategoryTotal.month == month
+    )
+    if user_email:
+        query = query.filter(MonthlyCategoryTotal.user_email == user_email)
+    return query.group_by(MonthlyCategoryTotal.is_income, MonthlyCategoryTotal.category)
+
+
+def month_version(year, month, user_email=None):
+    """Version of a user's month (everyone's without user_email), as a string.
+
+    Reads the MonthVersion counter that every rollup write bumps (through
+    any worker or the bulk path), so it can version cache keys with one
+    primary key lookup. '0' for a month that has never been written.
+    """
+    version = db.session.query(MonthVersion.version).filter_by(
+        user_email=user_email or '', year=year, month=month
+    ).scalar()
+    return str(version or 0)
+
+
+def monthly_flows(start_date, end_date, user_email=None):
+    """Income and expense totals per month for whole months in [start_date, end_date).
+
+    Returns {(year, month): (income, expenses)} for the months that have any
+    transactions. Both dates must fall on the first of a month.
+    """
+    period = tuple_(MonthlyCategoryTotal.year, MonthlyCategoryTotal.month)
+    query = db.session.query(
+        MonthlyCategoryTotal.year,
+        MonthlyCategoryTotal.month,
+        MonthlyCategoryTotal.is_income,
+        func.sum(MonthlyCategoryTotal.total)
+    ).filter(
+        period >= tuple_(start_date.year, start_date.month),
+        period < tuple_(end_date.year, end_date.month)
+    )
+    if user_email:
+        query = query.filter(MonthlyCategoryTotal.user_email == user_email)
+    query = query.group_by(MonthlyCategoryTotal.year, MonthlyCategoryTotal.month, MonthlyCategoryTotal.is_income)
+
+    flows = {}
+    for year, month, is_income, total in query:
+        income, expenses = flows.get((year, month), (0.0, 0.0))
+        if is_income:
+            income += float(total)
+        else:
+            expenses += float(total)
+        flows[(year, month)] = (income, expenses)
+    return flows
+
+
+def user_monthly_nets(start_date, end_date, user_emails=None):
+    """Net cash flow (income minus expenses) per user and month in [start_date, end_date).
+
+    Returns {user_email: [net, ...]} with one entry per month that has any
+    transactions, read in a single grouped query. Both dates must fall on
+    the first of a month.
+    """
+    period = tuple_(MonthlyCategoryTotal.year, MonthlyCategoryTotal.month)
+    net = func.sum(case((MonthlyCategoryTotal.is_income == True, MonthlyCategoryTotal.total),
+                        else_=-MonthlyCategoryTotal.total))
+    query = db.session.query(MonthlyCategoryTotal.user_email, net).filter(
+        period >= tuple_(start_date.year, start_date.month),
+        period < tuple_(end_date.year, end_date.month)
+    )
+    if user_emails is not None:
+        query = query.filter(MonthlyCategoryTotal.user_email.in_(user_emails))
+    query = query.group_by(MonthlyCategoryTotal.user_email, MonthlyCategoryTotal.year, MonthlyCategoryTotal.month)
+
+    nets = {}
+    for user_email, total in query:
+        nets.setdefault(user_email, []).append(float(total))
+    return nets
+
+
+def monthly_spent_query(user_emails, start_date, end_date, categories=None):
+    """Grouped (user_email, category, total) expenses for whole months in [start_date, end_date).
+
+    Both dates must fall on the first of a month.
+    """
+    period = tuple_(MonthlyCategoryTotal.year, MonthlyCategoryTotal.month)
+    query = db.session.query(
+        MonthlyCategoryTotal.user_email,
+        MonthlyCategoryTotal.category,
+        func.sum(MonthlyCategoryTotal.total)
+    ).filter(
+        MonthlyCategoryTotal.user_email.in_(user_emails),
+        period >= tuple_(start_date.year, start_date.month),
+        period < tuple_(end_date.year, end_date.month),
+        MonthlyCategoryTotal.is_income == False
+    )
+    if categories is not None:
+        query = query.filter(MonthlyCategoryTotal.category.in_(categories))
+    return query.group_by(MonthlyCategoryTotal.user_email, MonthlyCategoryTotal.category)
+
+
+def benchmark_ratios(year, month, benchmarks, total_income, user_email=None):
+    """Expense totals per benchmark bucket with their share of income, computed in SQL.
+
+    Categories not in `benchmarks` fall into 'Other'. Each row carries the
+    bucket name, its total, percentage_of_income (rounded to 0.1) and
+    whether it exceeds the bucket's benchmark percentage.
+    """
+    bucket = case(
+        (MonthlyCategoryTotal.category.in_(list(benchmarks)), MonthlyCategoryTotal.category),
+        else_='Other'
+    )
+    benchmark = case(benchmarks, value=bucket, else_=benchmarks.get('Other', 0))
+    total = func.sum(MonthlyCategoryTotal.total)
+    income = literal(float(total_income))
+    percentage = total * 100.0 / income
+    query = db.session.query(
+        bucket.label('category'),
+        total.label('total'),
+        case((income > 0, func.round(percentage, 1)), else_=0).label('percentage_of_income'),
+        case((income > 0, percentage > benchmark), else_=False).label('over_benchmark')
+    ).filter(
+        MonthlyCategoryTotal.year == year,
+        MonthlyCategoryTotal.month == month,
+        MonthlyCategoryTotal.is_income == False
+    )
+    if user_email:
+        query = query.filter(MonthlyCategoryTotal.user_email == user_email)
+    return query.group_by(bucket)
@@ -0,0 +1,205 @@
+from datetime import date
+import numpy as np
+from models import Budget, Debt, Goal
+from services.amortization import add_months, debt_arrays, first_payment_month
+from services.payoff_strategies import pay_month, priority_order
+from services.queries import parse_bool
+from services.rollups import monthly_flows
+
+RECURRENCES = ('once', 'monthly', 'yearly')
+
+# Complete months of history averaged into the baseline
+BASELINE_MONTHS = 6
+DEFAULT_HORIZON = 60
+MAX_HORIZON = 600
+MAX_SCENARIOS = 50
+
+
+def parse_scenario(data):
+    """Validate one scenario payload; raises ValueError with a readable message."""
+    name = data.get('name') or 'Scenario'
+    try:
+        amount = float(data['amount'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid amount for '{name}': {data.get('amount')!r}")
+    if amount <= 0:
+        raise ValueError(f"Amount for '{name}' must be positive")
+
+    recurring = data.get('recurring', 'once')
+    if recurring not in RECURRENCES:
+        raise ValueError(f"Invalid recurring for '{name}': {recurring!r} (use {', '.join(RECURRENCES)})")
+    try:
+        duration = int(data.get('duration', 1))
+        start_month = int(data.get('start_month', 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"duration and start_month for '{name}' must be integers")
+    if duration < 1 or start_month < 0:
+        raise ValueError(f"duration for '{name}' must be at least 1 and start_month not negative")
+    try:
+        is_income = parse_bool(data.get('is_income'))
+    except ValueError:
+        raise ValueError(f"is_income for '{name}' must be true or false")
+
+    return {
+        'name': name,
+        'amount': amount,
+        'recurring': recurring,
+        'duration': duration,
+        'start_month': start_month,
+        'is_income': is_income
+    }
+
+
+def monthly_baseline(user_email=None, months=BASELINE_MONTHS, today=None):
+    """Average monthly income and expenses over the last complete months.
+
+    Reads the monthly rollup and averages over the months that have any
+    transactions. Without history, expenses fall back to the monthly budget.
+    """
+    this_month = (today or date.today()).replace(day=1)
+    flows = monthly_flows(add_months(this_month, -months), this_month, user_email)
+    if flows:
+        history = len(flows)
+        return {'income': sum(i for i, _ in flows.values()) / history,
+                'expenses': sum(e for _, e in flows.values()) / history,
+                'months_of_history': history, 'source': 'transactions'}
+
+    budgets = Budget.query.filter_by(period='monthly')
+    if user_email:
+        budgets = budgets.filter_by(user_email=user_email)
+    budgeted = sum(float(limit or 0) for b in budgets for limit in (b.category_limits or {}).values())
+    return {'income': 0.0, 'expenses': budgeted, 'months_of_history': 0,
+            'source': 'budget' if budgeted else 'none'}
+
+
+def scenario_flows(scenarios, horizon):
+    """(n_scenarios, horizon) array of each scenario's signed monthly cash flow.
+
+    Month 0 is the first projected month. One-time amounts land in
+    start_month; monthly and yearly ones recur through `duration` months.
+    """
+    t = np.arange(horizon)[None, :]
+    amount = np.array([s['amount'] * (1 if s['is_income'] else -1) for s in scenarios], dtype=float)[:, None]
+    start = np.array([s['start_month'] for s in scenarios])[:, None]
+    duration = np.array([s['duration'] for s in scenarios])[:, None]
+    recurring = np.array([s['recurring'] for s in scenarios])[:, None]
+
+    offset = t - start
+    active = (offset >= 0) & (offset < duration)
+    hits = np.where(
+        recurring == 'once', offset == 0,
+        np.where(recurring == 'yearly', active & (offset % 12 == 0), active)
+    )
+    return np.where(hits, amount, 0.0)
+
+
+def goal_arrays(goals):
+    """Goals in funding order (priority 1 first, then earliest target date) and what each still needs."""
+    goals = sorted(goals, key=lambda g: (g.priority or 3, g.target_date or date.max, g.id))
+    needed = np.array([max((g.target_amount or 0) - (g.current_amount or 0), 0) for g in goals], dtype=float)
+    return goals, needed
+
+
+def project_scenarios(baseline, goals, debts, scenarios, horizon=DEFAULT_HORIZON, today=None):
+    """Project cash flow, goal completion and debt payoff for the baseline and every scenario at once.
+
+    Rows are the baseline plus one per scenario. Each month a row nets the
+    baseline income minus expenses plus the scenario's flow. Debt minimums
+    are taken to be part of the expenses already; any surplus goes to the
+    debts highest rate first (avalanche), and what is left, including the
+    minimums of cleared debts, is saved. Savings fund the goals one at a
+    time in priority order. Debts are stepped month by month and the rest
+    is array arithmetic across rows.
+    """
+    start = first_payment_month(today)
+    flows = np.vstack([np.zeros((1, horizon)), scenario_flows(scenarios, horizon)])
+    rows = len(flows)
+    net = baseline['income'] - baseline['expenses'] + flows
+
+    paid_to_debt = np.zeros((rows, horizon))
+    debt_free = np.full(rows, -1)
+    debt_interest = np.zeros(rows)
+    minimum_total = 0.0
+    if debts:
+        balance, rate, minimum = debt_arrays(debts)
+        order = priority_order('avalanche', [d.id for d in debts], balance, rate)
+        bal = np.tile(balance[order], (rows, 1))
+        rate = rate[order][None, :]
+        minimum = minimum[order][None, :]
+        minimum_total = float(minimum.sum())
+        if not bal.any():
+            debt_free[:] = 0
+        for month in range(horizon):
+            if not bal.any():
+                break
+            budget = minimum_total + np.maximum(net[:, month], 0)
+            bal, interest, paid = pay_month(bal, rate, minimum, budget)
+            debt_interest += interest.sum(axis=1)
+            paid_to_debt[:, month] = paid.sum(axis=1)
+            debt_free[(debt_free < 0) & (bal.sum(axis=1) == 0)] = month + 1
+    else:
+        debt_free[:] = 0
+
+    saved = net + minimum_total - paid_to_debt
+    savings = np.cumsum(saved, axis=1)
+
+    goals, needed = goal_arrays(goals)
+    # A goal is done once savings (never counting money later drawn back out) cover it and every goal ahead of it
+    funded = np.maximum.accumulate(np.maximum(savings, 0), axis=1)
+    reached = funded[:, None, :] >= np.cumsum(needed)[None, :, None] - 0.005
+    goal_months = np.where(needed[None, :] <= 0, 0,
+                           np.where(reached.any(axis=2), reached.argmax(axis=2) + 1, -1))
+
+    def month_date(month):
+        """Date of the month in which a 1-based month count is reached (0 is the first month)."""
+        return add_months(start, max(int(month) - 1, 0)) if month >= 0 else None
+
+    def goal_result(goal, needed, month):
+        completion = month_date(month)
+        return {
+            'id': goal.id,
+            'name': goal.name,
+            'remaining': round(float(needed), 2),
+            'months_to_complete': int(month) if month >= 0 else None,
+            'completion_date': completion.isoformat() if completion else None,
+            'on_track': goal.target_date is None or (completion is not None and completion <= goal.target_date)
+        }
+
+    def row_result(i):
+        debt_free_date = month_date(debt_free[i])
+        return {
+            'monthly_net': np.round(net[i], 2).tolist(),
+            'savings': np.round(savings[i], 2).tolist(),
+            'total_saved': round(float(savings[i, -1]), 2),
+            'months_to_debt_free': int(debt_free[i]) if debt_free[i] >= 0 else None,
+            'debt_free_date': debt_free_date.isoformat() if debt_free_date else None,
+            'debt_interest': round(float(debt_interest[i]), 2),
+            'goals': [goal_result(goal, needed[j], goal_months[i, j]) for j, goal in enumerate(goals)]
+        }
+
+    return {
+        'start': start.isoformat(),
+        'horizon': horizon,
+        'baseline': {
+            'monthly_income': round(baseline['income'], 2),
+            'monthly_expenses': round(baseline['expenses'], 2),
+            'monthly_net': round(baseline['income'] - baseline['expenses'], 2),
+            'debt_minimums': round(minimum_total, 2),
+            'months_of_history': baseline['months_of_history'],
+            'source': baseline['source'],
+            'projection': row_result(0)
+        },
+        'scenarios': [{**scenario, 'projection': row_result(i + 1)} for i, scenario in enumerate(scenarios)]
+    }
+
+
+def run_whatif(scenarios, user_email=None, horizon=DEFAULT_HORIZON, today=None):
+    """Load the user's baseline, goals and debts and project every scenario."""
+    goals = Goal.query.filter(Goal.is_achieved.isnot(True))
+    debts = Debt.query
+    if user_email:
+        goals = goals.filter(Goal.user_email == user_email)
+        debts = debts.filter(Debt.user_email == user_email)
+    baseline = monthly_baseline(user_email, today=today)
+    return project_scenarios(baseline, goals.all(), debts.order_by(Debt.id).all(),
+                             scenarios, horizon, today)
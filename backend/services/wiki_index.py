@@ -0,0 +1,136 @@
+import json
+import os
+import re
+from html.parser import HTMLParser
+from services.context_window import estimate_tokens
+
+INDEX_VERSION = 1
+WIKI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'financialLiteracyWiki')
+
+# Elements whose text becomes a paragraph of the index
+BLOCK_TAGS = {'h1', 'h2', 'h3', 'h4', 'p', 'li'}
+# Elements whose text is never shown as page content
+SKIP_TAGS = {'head', 'nav', 'footer', 'script', 'style'}
+WHITESPACE = re.compile(r'\s+')
+
+
+class WikiPageParser(HTMLParser):
+    """Collects (section_id, tag, text) blocks from one wiki page."""
+
+    def __init__(self):
+        super().__init__()
+        self.title = ''
+        self.blocks = []
+        self.section_id = 'intro'
+        self.skip_depth = 0
+        self.block_tag = None
+        self.block_text = []
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag == 'section':
+            self.section_id = dict(attrs).get('id') or f'section-{len(self.blocks)}'
+        elif tag in BLOCK_TAGS and self.skip_depth == 0 and self.block_tag is None:
+            self.block_tag = tag
+            self.block_text = []
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag == 'title':
+            self.in_title = False
+        elif tag == self.block_tag:
+            text = WHITESPACE.sub(' ', ''.join(self.block_text)).strip()
+            if text:
+                self.blocks.append((self.section_id, tag, text))
+            self.block_tag = None
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data.strip()
+        elif self.block_tag is not None:
+            self.block_text.append(data)
+
+
+def index_page(html):
+    """Index one page: its text plus sections of paragraphs with offsets into that text.
+
+    The page text is the paragraphs joined by blank lines, so a highlight can
+    be sent as (page id, start, end) instead of the page contents.
+    """
+    parser = WikiPageParser()
+    parser.feed(html)
+    parser.close()
+
+    text_parts = []
+    sections = []
+    offset = 0
+    for section_id, tag, block in parser.blocks:
+        if not sections or sections[-1]['id'] != section_id:
+            sections.append({'id': section_id, 'heading': None, 'start': offset, 'paragraphs': []})
+        section = sections[-1]
+        if section['heading'] is None and tag.startswith('h'):
+            section['heading'] = block
+        section['paragraphs'].append({
+            'id': f"{section_id}-{len(section['paragraphs']) + 1}",
+            'start': offset,
+            'end': offset + len(block),
+            'text': block,
+            'tokens': estimate_tokens(block)
+        })
+        text_parts.append(block)
+        offset += len(block) + 2
+
+    for section in sections:
+        section['end'] = section['paragraphs'][-1]['end']
+        section['tokens'] = sum(p['tokens'] for p in section['paragraphs'])
+
+    text = '\n\n'.join(text_parts)
+    return {
+        'title': parser.title,
+        'text': text,
+        'tokens': estimate_tokens(text),
+        'sections': sections
+    }
+
+
+def empty_index():
+    return {'version': INDEX_VERSION, 'pages': {}}
+
+
+def build_index(wiki_dir=WIKI_DIR):
+    """Index every .html page in wiki_dir, keyed by page id (file name without .html)."""
+    index = empty_index()
+    pages = index['pages']
+    for name in sorted(os.listdir(wiki_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(wiki_dir, name), encoding='utf-8') as f:
+            pages[name[:-len('.html')]] = index_page(f.read())
+    return index
+
+
+def write_index(path, wiki_dir=WIKI_DIR):
+    index = build_index(wiki_dir)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    return index
+
+
+def load_index(path, wiki_dir=WIKI_DIR):
+    """Load a prebuilt index, or build one in memory if it is missing or outdated."""
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION:
+            return index
+    return build_index(wiki_dir)
+
+
+def page_spans(page):
+    """(start, end) offsets of a page's paragraphs, for build_context."""
+    return [(p['start'], p['end']) for section in page['sections'] for p in section['paragraphs']]
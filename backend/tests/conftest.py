@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+from extensions import db
+
+
+def make_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    db.init_app(app)
+    return app
+
+
+@pytest.fixture
+def app():
+    """App on an in-memory database with the schema built from the models."""
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    """Test client for the transactions, debts and goals APIs, without background insight refreshes."""
+    from routes import debts, goals, transactions
+    monkeypatch.setattr(transactions, 'schedule_insights_refresh', lambda app, months_by_user: None)
+    app.register_blueprint(transactions.transactions_bp, url_prefix='/api/transactions')
+    app.register_blueprint(debts.debts_bp, url_prefix='/api/debts')
+    app.register_blueprint(goals.goals_bp, url_prefix='/api/goals')
+    return app.test_client()
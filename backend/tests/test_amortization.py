@@ -0,0 +1,46 @@
+import numpy as np
+from models import Debt
+from services.amortization import PAID_OFF, amortize, debt_arrays
+
+
+def debts():
+    return [
+        Debt(id=1, name='Card', remaining_balance=4000, interest_rate=22.9, minimum_payment=120),
+        Debt(id=2, name='Car', remaining_balance=9000, interest_rate=6.5, minimum_payment=250),
+        Debt(id=3, name='Friend', remaining_balance=600, interest_rate=0, minimum_payment=50),
+    ]
+
+
+def amortize_loop(balance, rate, payment, months):
+    """One debt stepped month by month, the way a statement would."""
+    rows = {'balance': [], 'payment': [], 'interest': []}
+    for _ in range(months):
+        interest = balance * rate
+        paid = min(payment, balance + interest) if balance > 0 else 0.0
+        balance = balance + interest - paid
+        if balance < PAID_OFF:
+            balance = 0.0
+        rows['balance'].append(balance)
+        rows['payment'].append(paid)
+        rows['interest'].append(interest)
+    return rows
+
+
+def test_amortize_matches_month_by_month_loop():
+    balance, rate, payment = debt_arrays(debts())
+    schedule = amortize(balance, rate, payment, 240)
+    for i in range(len(balance)):
+        expected = amortize_loop(balance[i], rate[i], payment[i], 240)
+        for field, values in expected.items():
+            np.testing.assert_allclose(schedule[field][i], values, atol=0.01)
+
+
+def test_payment_below_interest_never_pays_off():
+    schedule = amortize([1000], [0.02], [15], 120)
+    assert (np.diff(schedule['balance'][0]) > 0).all()
+
+
+def test_schedule_rejects_a_non_finite_extra(client):
+    for extra in ('nan', 'inf', '-1'):
+        assert client.get(f'/api/debts/schedule?extra={extra}').status_code == 400
+    assert client.get('/api/debts/schedule?extra=25').status_code == 200
@@ -0,0 +1,61 @@
+import json
+import time
+from contextlib import closing
+from services.cache import MemoryCache, SQLiteCache
+
+
+def stored(cache):
+    """(entries, bytes) counted from the table, and as kept in cache_size."""
+    with closing(cache.connect()) as conn:
+        actual = conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache').fetchone()
+        counted = conn.execute('SELECT entries, bytes FROM cache_size').fetchone()
+    return actual, counted
+
+
+def test_sqlite_cache_keeps_size_counters(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_entries=100)
+    cache.set('a', 'x' * 10)
+    cache.set('b', {'v': [1, 2, 3]})
+    cache.set('a', 'y' * 50)
+    cache.delete('b')
+    actual, counted = stored(cache)
+    assert actual == counted == (1, len(json.dumps('y' * 50)))
+    cache.clear()
+    assert stored(cache) == ((0, 0), (0, 0))
+
+
+def test_sqlite_cache_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_entries=1000, max_bytes=1000)
+    for i in range(30):
+        cache.set(f'k{i}', 'x' * 98)  # 100 bytes stored
+        if i == 5:
+            assert cache.get('k0') is not None  # k0 is now the most recently used of the early keys
+    actual, counted = stored(cache)
+    assert actual == counted
+    assert counted[1] <= 1000
+    assert cache.get('k29') is not None
+    assert cache.get('k1') is None
+
+
+def test_sqlite_cache_caps_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_entries=3)
+    for i in range(5):
+        cache.set(f'k{i}', i)
+    assert [cache.get(f'k{i}') for i in range(5)] == [None, None, 2, 3, 4]
+    assert stored(cache)[1][0] == 3
+
+
+def test_sqlite_cache_counts_rows_written_before_the_counters(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = SQLiteCache(path)
+    cache.set('a', 'x')
+    with closing(cache.connect()) as conn, conn:
+        conn.execute('DROP TABLE cache_size')
+    assert stored(SQLiteCache(path)) == ((1, 3), (1, 3))
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    for cache in (MemoryCache(ttl=0.01), SQLiteCache(str(tmp_path / 'cache.db'), ttl=0.01)):
+        cache.set('a', 1)
+        time.sleep(0.02)
+        assert cache.get('a') is None
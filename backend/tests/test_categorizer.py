@@ -0,0 +1,70 @@
+import pytest
+from extensions import db
+from models import Transaction
+from services.categorizer import (
+    DEFAULT_CATEGORY, INCOME_CATEGORY, Categorizer, PendingLabels, categorize_rows, categorizer_for, categorizers
+)
+
+EMAIL = 'user@example.com'
+
+
+@pytest.fixture(autouse=True)
+def fresh_categorizers():
+    categorizers.clear()
+    yield
+    categorizers.clear()
+
+
+def row(name, category=None, is_income=False):
+    return {'name': name, 'amount': 10.0, 'category': category, 'is_income': is_income, 'user_email': EMAIL}
+
+
+def test_fallback_order():
+    categorizer = Categorizer([
+        ('Starbucks Reserve', 'Coffee', 3),     # the user's label beats the 'starbucks' keyword
+        ('Zumba Club', 'Health', 2),
+        ('Zumba Studio', 'Health', 1),
+        ('Corner Deli', 'Lunch', 2),
+    ])
+    assert categorizer.categorize('STARBUCKS RESERVE #123') == 'Coffee'
+    assert categorizer.categorize('ZUMBA CLUB', is_income=True) == 'Health'
+    assert categorizer.categorize('Payroll ACME', is_income=True) == INCOME_CATEGORY
+    assert categorizer.categorize('Starbucks 0456') == 'Food'
+    # The longest keyword phrase wins
+    assert categorizer.categorize('UBER EATS 8842') == 'Food'
+    assert categorizer.categorize('UBER TRIP 8842') == 'Transportation'
+    # Unknown merchant, but a word the model has seen only under one label
+    assert categorizer.categorize('Zumba Downtown') == 'Health'
+    assert categorizer.categorize('Qwerty Emporium') == DEFAULT_CATEGORY
+
+
+def test_most_used_label_wins_for_a_merchant():
+    categorizer = Categorizer([('Costco', 'Household', 3), ('Costco', 'Food', 1)])
+    assert categorizer.categorize('COSTCO 0012') == 'Household'
+    categorizer.learn('Costco', 'Food', 5)
+    assert categorizer.categorize('COSTCO 0012') == 'Food'
+
+
+def test_labelled_history_skips_auto_categorized_and_income(app):
+    db.session.add_all([
+        Transaction(name='Zumba Club', amount=30, category='Health', user_email=EMAIL),
+        Transaction(name='Corner Deli', amount=9, category='Housing', auto_categorized=True, user_email=EMAIL),
+        Transaction(name='Acme Payroll', amount=900, category='Salary', is_income=True, user_email=EMAIL),
+    ])
+    db.session.commit()
+    categorizer = categorizer_for(EMAIL)
+    assert categorizer.categorize('ZUMBA CLUB') == 'Health'
+    assert categorizer.categorize('Corner Deli') == DEFAULT_CATEGORY
+    assert categorizer.categorize('Acme Payroll') == DEFAULT_CATEGORY
+
+
+def test_rows_in_one_import_label_each_other_before_commit(app):
+    labels = PendingLabels()
+    rows = categorize_rows([row('Pilates Place', 'Health'), row('PILATES PLACE 22'), row('Shell Oil 5')], labels)
+    assert [(r['category'], r['auto_categorized']) for r in rows] == [
+        ('Health', False), ('Health', True), ('Transportation', True)
+    ]
+    # Nothing reaches the shared categorizer until the rows are committed
+    assert categorizer_for(EMAIL).categorize('Pilates Place') == DEFAULT_CATEGORY
+    labels.learn()
+    assert categorizer_for(EMAIL).categorize('Pilates Place') == 'Health'
@@ -0,0 +1,71 @@
+from datetime import date
+import numpy as np
+from models import Goal
+from services.goal_planner import allocate, plan_goals
+
+TODAY = date(2025, 1, 15)  # plans start 2025-02-01
+
+
+def goal(id, priority, target, target_date=None, current=0, user='user@example.com'):
+    return Goal(id=id, name=f'Goal {id}', priority=priority, target_amount=target, current_amount=current,
+                target_date=target_date, user_email=user)
+
+
+def test_allocate_fills_goals_in_priority_order():
+    contributions, unallocated = allocate(np.array([[300.0, 200.0]]), np.array([[-1, -1]]), np.full((1, 6), 100.0))
+    assert contributions[0, 0].tolist() == [100, 100, 100, 0, 0, 0]
+    assert contributions[0, 1].tolist() == [0, 0, 0, 100, 100, 0]
+    assert unallocated[0].tolist() == [0, 0, 0, 0, 0, 100]
+
+
+def test_allocate_paces_deadlines_before_priority():
+    # The low priority goal is due in 4 months, so it gets 400 / 4 every month first
+    contributions, _ = allocate(np.array([[1000.0, 400.0]]), np.array([[-1, 4]]), np.full((1, 8), 300.0))
+    assert contributions[0, 1, :4].tolist() == [100, 100, 100, 100]
+    assert contributions[0, 0, :4].tolist() == [200, 200, 200, 200]
+    assert contributions[0].sum(axis=0).max() <= 300
+
+
+def test_plan_meets_deadlines_before_higher_priorities():
+    goals = [
+        goal(1, 1, 2000),
+        goal(2, 3, 600, target_date=date(2025, 7, 31)),   # 6 months: 100 a month
+        goal(3, 2, 2400, target_date=date(2026, 1, 31)),  # 12 months: 200 a month
+    ]
+    plan = plan_goals(goals, surpluses={'user@example.com': 500}, horizon=60, today=TODAY)
+    by_id = {g['id']: g for g in plan['plans']['user@example.com']['goals']}
+    assert [g['id'] for g in plan['plans']['user@example.com']['goals']] == [1, 3, 2]
+    assert by_id[2]['on_track'] and by_id[2]['completion_date'] <= '2025-07-31'
+    assert by_id[3]['on_track'] and by_id[3]['completion_date'] <= '2026-01-31'
+    # The top priority goal without a deadline gets what the paces leave over
+    assert by_id[1]['contributions'][0] == 200
+    monthly = np.sum([g['contributions'] + [0] * (60 - len(g['contributions'])) for g in by_id.values()], axis=0)
+    assert monthly.max() <= 500.01
+
+
+def test_plan_flags_deadline_it_cannot_meet():
+    plan = plan_goals([goal(1, 1, 5000, target_date=date(2025, 3, 31))],
+                      surpluses={'user@example.com': 500}, horizon=24, today=TODAY)
+    result = plan['plans']['user@example.com']['goals'][0]
+    assert result['months_to_complete'] == 10
+    assert not result['on_track']
+
+
+def test_plan_users_are_independent():
+    goals = [goal(1, 1, 1000, user='a@x.com'), goal(2, 1, 1000, user='b@x.com')]
+    plan = plan_goals(goals, surpluses={'a@x.com': 250, 'b@x.com': 100}, horizon=24, today=TODAY)
+    assert plan['plans']['a@x.com']['goals'][0]['months_to_complete'] == 4
+    assert plan['plans']['b@x.com']['goals'][0]['months_to_complete'] == 10
+
+
+def test_plan_without_surplus_funds_nothing():
+    plan = plan_goals([goal(1, 1, 1000)], surpluses={}, horizon=12, today=TODAY)
+    result = plan['plans']['user@example.com']['goals'][0]
+    assert result['months_to_complete'] is None and result['on_track']
+
+
+def test_plan_route_parses_include_debts_strictly(client):
+    for value in ('true', '1', 'FALSE', '0'):
+        assert client.get(f'/api/goals/plan?include_debts={value}').status_code == 200
+    for value in ('yes', 'on', ''):
+        assert client.get(f'/api/goals/plan?include_debts={value}').status_code == 400
@@ -0,0 +1,58 @@
+from datetime import date
+from models import Debt
+from services.amortization import debt_arrays
+from services.payoff_strategies import compare_strategies
+
+TODAY = date(2025, 1, 15)
+
+
+def debts():
+    return [
+        Debt(id=1, name='Card', remaining_balance=4000, interest_rate=22.9, minimum_payment=120),
+        Debt(id=2, name='Car', remaining_balance=9000, interest_rate=6.5, minimum_payment=250),
+        Debt(id=3, name='Friend', remaining_balance=600, interest_rate=0, minimum_payment=50),
+    ]
+
+
+def test_strategies_at_minimum_budget_match_baseline():
+    # One debt: nothing is freed up to roll over, so every order is the baseline
+    debt = debts()[:1]
+    result = compare_strategies(debt, [120], months=600, today=TODAY)
+    baseline = result['baseline']
+    for strategy in result['strategies'].values():
+        assert strategy['months_to_freedom'] == [baseline['months_to_freedom']]
+        assert abs(strategy['total_interest'][0] - baseline['total_interest']) <= 0.05
+        assert abs(strategy['interest_saved'][0]) <= 0.05
+
+
+def test_strategies_at_minimum_budget_roll_freed_minimums_over():
+    # With several debts, minimums freed by a cleared debt roll into the rest
+    balance, rate, minimum = debt_arrays(debts())
+    result = compare_strategies(debts(), [minimum.sum()], months=600, today=TODAY)
+    baseline = result['baseline']
+    for strategy in result['strategies'].values():
+        assert strategy['months_to_freedom'][0] <= baseline['months_to_freedom']
+        assert strategy['interest_saved'][0] >= 0
+
+
+def test_budget_below_minimums_is_infeasible():
+    result = compare_strategies(debts(), [100], months=600, today=TODAY)
+    for strategy in result['strategies'].values():
+        assert strategy['months_to_freedom'] == [None]
+
+
+def test_extra_budget_orders_strategies():
+    result = compare_strategies(debts(), [800], ['avalanche', 'snowball'], months=600, today=TODAY)
+    avalanche, snowball = result['strategies']['avalanche'], result['strategies']['snowball']
+    assert avalanche['order'] == [1, 2, 3]
+    assert snowball['order'] == [3, 1, 2]
+    assert avalanche['total_interest'][0] <= snowball['total_interest'][0]
+    assert avalanche['interest_saved'][0] > 0
+
+
+def test_strategies_route_rejects_a_bad_custom_order(client):
+    for custom_order in (5, {'a': 1}, ['1', '2'], [1, None], [True]):
+        response = client.post('/api/debts/strategies', json={'custom_order': custom_order, 'budgets': [500]})
+        assert response.status_code == 400
+    response = client.post('/api/debts/strategies', json={'custom_order': [3, 1], 'budgets': [500]})
+    assert response.status_code == 200
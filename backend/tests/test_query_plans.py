@@ -0,0 +1,33 @@
+import os
+import pytest
+from flask_migrate import Migrate, upgrade
+from explain_queries import KNOWN_FULL_SCANS, explain, route_queries, scans_full_table
+from extensions import db
+from conftest import make_app
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def unexpected_full_scans():
+    return {label: plan for label, query in route_queries()
+            for plan in [explain(query)]
+            if scans_full_table(plan) and label not in KNOWN_FULL_SCANS}
+
+
+def test_route_queries_use_indexes(app):
+    assert unexpected_full_scans() == {}
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    """App on a file database built by running every migration."""
+    app = make_app(f"sqlite:///{tmp_path / 'app.db'}")
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield app
+        db.session.remove()
+
+
+def test_migrated_schema_uses_indexes(migrated_app):
+    assert unexpected_full_scans() == {}
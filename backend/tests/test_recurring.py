@@ -0,0 +1,97 @@
+import itertools
+from collections import namedtuple
+from datetime import date, timedelta
+from extensions import db
+from models import Transaction
+from services.recurring import detect_period, find_series, merchant_key, next_occurrence, refresh_recurring
+
+TODAY = date(2025, 7, 10)
+EMAIL = 'user@example.com'
+
+Row = namedtuple('Row', 'name amount is_income date')
+
+
+def weekly(start, count):
+    return [start + timedelta(days=7 * i) for i in range(count)]
+
+
+def monthly(start, count):
+    dates = [start]
+    for _ in range(count - 1):
+        dates.append(next_occurrence(dates[-1], 'monthly'))
+    return dates
+
+
+def add(name, amount, dates, is_income=False):
+    for day in dates:
+        db.session.add(Transaction(name=name, amount=amount, is_income=is_income, date=day, user_email=EMAIL))
+    db.session.commit()
+
+
+def series_of(name):
+    rows = Transaction.query.filter_by(name=name).all()
+    return {(row.recurring, row.recurrence, row.next_expected_date) for row in rows}
+
+
+def test_merchant_key_drops_reference_codes():
+    assert merchant_key('SPOTIFY P1A2B3C4') == 'spotify'
+    assert merchant_key('POS DEBIT NETFLIX.COM 866-579') == 'netflix'
+    assert merchant_key('SPOTIFY P1A2B3C4') == merchant_key('Spotify Z9Y8X7')
+
+
+def test_detect_period():
+    assert detect_period(weekly(date(2025, 1, 6), 8)) == 'weekly'
+    assert detect_period(monthly(date(2025, 1, 31), 6)) == 'monthly'
+    assert detect_period(weekly(date(2025, 1, 6), 2)) is None
+    assert detect_period([date(2025, 1, 1), date(2025, 1, 4), date(2025, 2, 20), date(2025, 2, 22)]) is None
+
+
+def test_price_rise_stays_one_series():
+    dates = monthly(date(2025, 1, 5), 8)
+    rows = [Row('Netflix', 15.49 if i < 4 else 17.99, False, day) for i, day in enumerate(dates)]
+    assert [(len(members), period) for members, period in find_series(rows)] == [(8, 'monthly')]
+
+
+def test_subscriptions_from_one_merchant_split_by_amount():
+    rows = [Row('APPLE.COM/BILL', 0.99, False, day) for day in monthly(date(2025, 1, 3), 6)]
+    rows += [Row('APPLE.COM/BILL', 9.99, False, day) for day in monthly(date(2025, 1, 18), 6)]
+    rows.append(Row('APPLE.COM/BILL', 1299, False, date(2025, 3, 9)))
+    series = sorted((members[0].amount, len(members), period) for members, period in find_series(rows))
+    assert series == [(0.99, 6, 'monthly'), (9.99, 6, 'monthly'), (1299, 1, None)]
+
+
+def test_refresh_marks_weekly_monthly_and_lapsed_series(app):
+    add('GYM 123', 20, weekly(date(2025, 5, 5), 10))             # last on 2025-07-07
+    add('Rent', 1200, monthly(date(2025, 1, 1), 7))              # last on 2025-07-01
+    add('Payroll', 3000, monthly(date(2025, 1, 15), 6), is_income=True)
+    add('Old Streaming', 9.99, monthly(date(2024, 6, 1), 6))    # stopped in 2024
+    add('Hardware Store', 40, [date(2025, 2, 3), date(2025, 3, 30), date(2025, 6, 2)])
+
+    assert refresh_recurring(EMAIL, today=TODAY) > 0
+    assert series_of('GYM 123') == {(True, 'weekly', date(2025, 7, 14))}
+    assert series_of('Rent') == {(True, 'monthly', date(2025, 8, 1))}
+    assert series_of('Payroll') == {(True, 'monthly', date(2025, 7, 15))}
+    assert series_of('Old Streaming') == {(True, 'monthly', None)}
+    assert series_of('Hardware Store') == {(False, None, None)}
+
+    # Nothing changed, nothing written
+    assert refresh_recurring(EMAIL, today=TODAY) == 0
+
+
+def test_refresh_of_one_merchant_leaves_the_rest(app):
+    add('Rent', 1200, monthly(date(2025, 1, 1), 7))
+    add('GYM', 20, weekly(date(2025, 5, 5), 10))
+    refresh_recurring(EMAIL, {'rent'}, today=TODAY)
+    assert series_of('Rent') == {(True, 'monthly', date(2025, 8, 1))}
+    assert series_of('GYM') == {(False, None, None)}
+
+
+def test_bulk_import_of_more_than_a_thousand_merchants(client):
+    words = [''.join(letters) for letters in itertools.product('bcdfghjk', 'aeiou', 'lmnprst', 'aeiou')]
+    assert len(words) > 1000
+    payload = [{'name': f'{word} store', 'amount': 12.5, 'date': day.isoformat(), 'email': EMAIL}
+               for word in words for day in monthly(date(2025, 4, 2), 3)]
+    response = client.post('/api/transactions/bulk', json=payload)
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == len(payload)
+    assert Transaction.query.filter_by(recurring=True, recurrence='monthly').count() == len(payload)
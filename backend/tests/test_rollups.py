@@ -0,0 +1,63 @@
+from datetime import date
+from extensions import db
+from models import MonthlyCategoryTotal, Transaction
+from services.rollups import month_version, rebuild_monthly_totals
+
+EMAIL = 'user@example.com'
+
+
+def rollup():
+    return sorted(
+        (row.user_email, row.year, row.month, row.category, row.is_income, round(row.total, 2), row.count)
+        for row in MonthlyCategoryTotal.query
+    )
+
+
+def assert_matches_rebuild():
+    incremental = rollup()
+    rebuild_monthly_totals()
+    assert incremental == rollup()
+    return incremental
+
+
+def add(**fields):
+    transaction = Transaction(**{'name': 'Corner Deli', 'amount': 10.0, 'category': 'Food',
+                                 'date': date(2025, 3, 4), 'user_email': EMAIL, **fields})
+    db.session.add(transaction)
+    db.session.commit()
+    return transaction
+
+
+def test_insert_update_and_delete_keep_the_rollup_in_step(app):
+    deli = add()
+    add(amount=20.0)
+    add(name='Payroll', amount=900.0, category='Salary', is_income=True)
+    add(amount=5.0, user_email='other@example.com')
+    assert (EMAIL, 2025, 3, 'Food', False, 30.0, 2) in assert_matches_rebuild()
+
+    # Each commit expires the instance, so these updates must load the old values themselves
+    deli.date = date(2025, 4, 1)
+    db.session.commit()
+    deli.amount = 12.5
+    deli.category = 'Lunch'
+    db.session.commit()
+    deli.is_income = True
+    deli.user_email = 'other@example.com'
+    db.session.commit()
+    rows = assert_matches_rebuild()
+    assert (EMAIL, 2025, 3, 'Food', False, 20.0, 1) in rows
+    assert ('other@example.com', 2025, 4, 'Lunch', True, 12.5, 1) in rows
+    assert not [row for row in rows if row[:3] == (EMAIL, 2025, 4)]
+
+    db.session.delete(deli)
+    db.session.commit()
+    assert not [row for row in assert_matches_rebuild() if row[2] == 4]
+
+
+def test_writes_bump_the_month_version(app):
+    assert month_version(2025, 3, EMAIL) == '0'
+    deli = add()
+    before = month_version(2025, 3, EMAIL), month_version(2025, 3)
+    deli.amount = 11.0
+    db.session.commit()
+    assert (month_version(2025, 3, EMAIL), month_version(2025, 3)) != before
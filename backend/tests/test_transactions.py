@@ -0,0 +1,44 @@
+from models import MonthlyCategoryTotal, Transaction
+
+EMAIL = 'user@example.com'
+
+
+def transaction(name='Corner Deli', amount=12.5, **fields):
+    return {'name': name, 'amount': amount, 'date': '2025-03-04', 'category': 'Food', 'email': EMAIL, **fields}
+
+
+def test_bulk_reports_bad_rows_and_inserts_the_rest(client):
+    payload = [
+        transaction(),
+        transaction(name=None),
+        transaction(name=123),
+        transaction(name='  '),
+        transaction(amount='nan'),
+        transaction(amount='inf'),
+        transaction(amount=[5]),
+        transaction(category=['Food']),
+        transaction(email={'a': 1}),
+        transaction(is_income='maybe'),
+        transaction(date='March 4th'),
+        transaction(name='Bakery', amount='7.25'),
+    ]
+    response = client.post('/api/transactions/bulk', json=payload)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['inserted'] == 2
+    assert [error['index'] for error in body['errors']] == list(range(1, 11))
+    assert sorted(name for (name,) in Transaction.query.with_entities(Transaction.name)) == ['Bakery', 'Corner Deli']
+    assert [(row.total, row.count) for row in MonthlyCategoryTotal.query] == [(19.75, 2)]
+
+
+def test_bulk_with_only_bad_rows_is_rejected(client):
+    response = client.post('/api/transactions/bulk', json=[transaction(amount='-inf'), transaction(name=None)])
+    assert response.status_code == 400
+    assert response.get_json()['inserted'] == 0
+    assert Transaction.query.count() == 0
+
+
+def test_single_insert_rejects_a_non_finite_amount(client):
+    response = client.post('/api/transactions', json=transaction(amount='NaN'))
+    assert response.status_code == 400
+    assert Transaction.query.count() == 0